@@ -1,4 +1,18 @@
+import argparse
+import json
+import os
 import re
+import time
+from collections import deque
+from itertools import islice
+
+SCORE_WORKERS = int(os.getenv("SCORE_WORKERS", str(os.cpu_count() or 1)))
+SCORE_CHUNK_LINES = int(os.getenv("SCORE_CHUNK_LINES", "5000"))
+
+COMPETENCY_RE = re.compile(r'complete\s+(.+?)\s*\(Level', re.I)
+LEVEL_RE = re.compile(r'Level:\s*(E\d+)', re.I)
+# Any of e0-e4 in the lowercased answer counts as a roadmap sequence.
+ROADMAP_LEVEL_RE = re.compile(r'e[0-4]')
 
 def extract_competency_and_level(question: str):
     """
@@ -7,8 +21,8 @@ def extract_competency_and_level(question: str):
     'How to complete Azure (Level: E1)'
     """
 
-    comp_match = re.search(r'complete\s+(.+?)\s*\(Level', question, re.I)
-    level_match = re.search(r'Level:\s*(E\d+)', question, re.I)
+    comp_match = COMPETENCY_RE.search(question)
+    level_match = LEVEL_RE.search(question)
 
     competency = comp_match.group(1) if comp_match else ""
     level = level_match.group(1) if level_match else ""
@@ -33,7 +47,7 @@ def evaluate_answer(answer: str, competency: str, target_level: str):
         score += 1
 
     # Check 2: roadmap sequence present
-    if any(lvl in answer for lvl in ["e0", "e1", "e2", "e3", "e4"]):
+    if ROADMAP_LEVEL_RE.search(answer):
         score += 1
 
     # Check 3: target level mentioned
@@ -48,4 +62,132 @@ def compute_answer_accuracy(question: str, answer: str):
     if not competency or not level:
         return 0
 
-    return evaluate_answer(answer, competency, level)
\ No newline at end of file
+    return evaluate_answer(answer, competency, level)
+
+
+def score_lines(lines):
+    """
+    Score a chunk of JSONL log lines. Returns (totals, skipped) where
+    totals maps (competency, level) -> [answers, score sum, full marks].
+    Runs in a worker process.
+    """
+
+    totals = {}
+    skipped = 0
+
+    for line in lines:
+        try:
+            item = json.loads(line)
+            question, answer = item["question"], item["answer"]
+        except (ValueError, KeyError, TypeError):
+            skipped += 1
+            continue
+
+        if not isinstance(question, str) or not isinstance(answer, str):
+            skipped += 1
+            continue
+
+        competency, level = extract_competency_and_level(question)
+
+        if not competency or not level:
+            skipped += 1
+            continue
+
+        score = evaluate_answer(answer, competency, level)
+        entry = totals.setdefault((competency.lower(), level.upper()), [0, 0.0, 0])
+        entry[0] += 1
+        entry[1] += score
+        entry[2] += score == 1
+
+    return totals, skipped
+
+
+def score_log(path, workers: int = SCORE_WORKERS, chunk_lines: int = SCORE_CHUNK_LINES):
+    """
+    Stream a JSONL log of {"question", "answer"} exchanges through a
+    process pool, a bounded number of chunks at a time, and aggregate
+    accuracy per competency and level.
+    """
+
+    # Imported here: the portal imports this module for the scorers only.
+    from concurrent.futures import ProcessPoolExecutor
+
+    totals = {}
+    skipped = 0
+    scored = 0
+    started = time.monotonic()
+
+    def collect(future):
+        nonlocal skipped, scored
+
+        chunk_totals, chunk_skipped = future.result()
+        skipped += chunk_skipped
+
+        for key, (count, score_sum, full) in chunk_totals.items():
+            entry = totals.setdefault(key, [0, 0.0, 0])
+            entry[0] += count
+            entry[1] += score_sum
+            entry[2] += full
+            scored += count
+
+    with open(path) as f, ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque()
+
+        while True:
+            chunk = list(islice(f, chunk_lines))
+            if not chunk:
+                break
+
+            # A chunk of only blank lines is not the end of the file.
+            lines = [line for line in chunk if line.strip()]
+            if not lines:
+                continue
+
+            in_flight.append(pool.submit(score_lines, lines))
+
+            if len(in_flight) >= workers * 2:
+                collect(in_flight.popleft())
+
+        while in_flight:
+            collect(in_flight.popleft())
+
+    elapsed = time.monotonic() - started
+    print(f"Scored {scored} answers ({scored / max(elapsed, 1e-9):.0f}/s), skipped {skipped}")
+
+    by_competency = [
+        {
+            "competency": competency,
+            "level": level,
+            "answers": count,
+            "accuracy": score_sum / count,
+            "fully_correct": full / count,
+        }
+        for (competency, level), (count, score_sum, full) in sorted(totals.items())
+    ]
+
+    return {
+        "answers": scored,
+        "skipped": skipped,
+        "accuracy": (
+            sum(e[1] for e in totals.values()) / scored if scored else 0
+        ),
+        "by_competency": by_competency,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Score a JSONL log of advisor answers in bulk."
+    )
+    parser.add_argument("log", help="JSONL with question and answer fields")
+    parser.add_argument("--out", default="answer_accuracy.json")
+    parser.add_argument("--workers", type=int, default=SCORE_WORKERS)
+    parser.add_argument("--chunk-lines", type=int, default=SCORE_CHUNK_LINES)
+    args = parser.parse_args()
+
+    report = score_log(args.log, args.workers, args.chunk_lines)
+
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"Overall accuracy {report['accuracy']:.3f}; report written to {args.out}")
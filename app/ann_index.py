@@ -0,0 +1,151 @@
+import argparse
+import time
+
+import numpy as np
+from sqlalchemy import text
+from app.db import engine, SessionLocal
+from app.rag import NEAREST_SQL
+
+INDEX_NAMES = {
+    "hnsw": "competency_catalog_embedding_hnsw",
+    "ivfflat": "competency_catalog_embedding_ivfflat",
+}
+
+
+def create_index(method, m=16, ef_construction=64, lists=100):
+    if method == "hnsw":
+        options = f"m = {int(m)}, ef_construction = {int(ef_construction)}"
+    else:
+        options = f"lists = {int(lists)}"
+
+    # CONCURRENTLY keeps the catalog readable during the build but can't
+    # run inside a transaction.
+    with engine.connect().execution_options(
+        isolation_level="AUTOCOMMIT"
+    ) as conn:
+        conn.execute(text(f"""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX_NAMES[method]}
+            ON public.competency_catalog
+            USING {method} (embedding vector_cosine_ops)
+            WITH ({options})
+        """))
+
+    print(f"Created {INDEX_NAMES[method]} ({options})")
+
+
+def drop_index(method):
+    with engine.connect().execution_options(
+        isolation_level="AUTOCOMMIT"
+    ) as conn:
+        conn.execute(text(
+            f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAMES[method]}"
+        ))
+
+    print(f"Dropped {INDEX_NAMES[method]}")
+
+
+def _top_k(session, embedding, k, settings):
+    for name, value in settings.items():
+        session.execute(
+            text("SELECT set_config(:name, :value, true)"),
+            {"name": name, "value": str(value)},
+        )
+
+    # The statement /ask runs, so the numbers describe production queries.
+    started = time.perf_counter()
+    ids = [
+        r.competency_id
+        for r in session.execute(
+            text(NEAREST_SQL), {"embedding": embedding, "limit": k}
+        )
+    ]
+    elapsed = time.perf_counter() - started
+
+    session.rollback()
+
+    return ids, elapsed
+
+
+def benchmark(method, values, k=5, queries=200):
+    """
+    Compare ANN results against exact search for each search setting and
+    print recall@k with p50/p99 latency.
+    """
+
+    param = "hnsw.ef_search" if method == "hnsw" else "ivfflat.probes"
+    session = SessionLocal()
+
+    try:
+        samples = session.execute(text("""
+            SELECT embedding
+            FROM public.competency_catalog
+            WHERE embedding IS NOT NULL
+            ORDER BY random()
+            LIMIT :n
+        """), {"n": queries}).scalars().all()
+        session.rollback()
+
+        # Disabling index scans forces the exact sequential ranking.
+        exact = [
+            set(_top_k(session, e, k, {"enable_indexscan": "off"})[0])
+            for e in samples
+        ]
+
+        print(f"{param:>16} {'recall@' + str(k):>10} {'p50 ms':>8} {'p99 ms':>8}")
+
+        for value in values:
+            recalls, latencies = [], []
+
+            for embedding, truth in zip(samples, exact):
+                ids, elapsed = _top_k(session, embedding, k, {param: value})
+                recalls.append(len(truth.intersection(ids)) / max(len(truth), 1))
+                latencies.append(elapsed * 1000)
+
+            print(
+                f"{value:>16} {np.mean(recalls):>10.3f} "
+                f"{np.percentile(latencies, 50):>8.2f} "
+                f"{np.percentile(latencies, 99):>8.2f}"
+            )
+
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Manage and benchmark ANN indexes on competency_catalog.embedding."
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    create = sub.add_parser("create")
+    create.add_argument("--method", choices=INDEX_NAMES, default="hnsw")
+    create.add_argument("--m", type=int, default=16)
+    create.add_argument("--ef-construction", type=int, default=64)
+    create.add_argument("--lists", type=int, default=100)
+
+    drop = sub.add_parser("drop")
+    drop.add_argument("--method", choices=INDEX_NAMES, default="hnsw")
+
+    bench = sub.add_parser("bench")
+    bench.add_argument("--method", choices=INDEX_NAMES, default="hnsw")
+    bench.add_argument(
+        "--values",
+        default="10,20,40,80,160",
+        help="comma separated ef_search (hnsw) or probes (ivfflat) to try",
+    )
+    bench.add_argument("-k", type=int, default=5)
+    bench.add_argument("--queries", type=int, default=200)
+
+    args = parser.parse_args()
+
+    if args.command == "create":
+        create_index(args.method, args.m, args.ef_construction, args.lists)
+    elif args.command == "drop":
+        drop_index(args.method)
+    else:
+        benchmark(
+            args.method,
+            [int(v) for v in args.values.split(",")],
+            args.k,
+            args.queries,
+        )
@@ -0,0 +1,37 @@
+import hashlib
+import json
+import os
+
+from app.embedding_cache import normalize
+from app.ttl_cache import TTLCache
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+
+# Row fields that feed the prompt. A change to any of them changes the key,
+# so an edited catalog row can never serve an answer built from old text.
+CONTEXT_FIELDS = (
+    "competency_id",
+    "competency_name",
+    "description",
+    "category",
+    "focus_area",
+    "proficiency_level_name",
+)
+
+
+def answer_key(question: str, context_rows, model: str, prompt_version: str):
+    payload = json.dumps(
+        [
+            normalize(question),
+            [[getattr(r, f, None) for f in CONTEXT_FIELDS] for r in context_rows],
+            model,
+            prompt_version,
+        ],
+        default=str,
+    )
+
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+answer_cache = TTLCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL_SECONDS)
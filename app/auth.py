@@ -1,76 +1,161 @@
+import asyncio
+import os
 import uuid
 from sqlalchemy import text
-from app.db import SessionLocal
-from passlib.context import CryptContext
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import db
+from app.db import get_db
+from app.ttl_cache import TTLCache
+from app.passwords import hash_password, verify_password
+from app.passwords import verify_and_update, password_pool
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", str(12 * 3600)))
+# How long a worker trusts a cached token before re-checking the database.
+# A logout on another worker takes effect within this window.
+SESSION_CACHE_TTL_SECONDS = float(os.getenv("SESSION_CACHE_TTL_SECONDS", "60"))
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+SESSION_PURGE_INTERVAL_SECONDS = float(
+    os.getenv("SESSION_PURGE_INTERVAL_SECONDS", "600")
+)
 
-MAX_BCRYPT_BYTES = 72
+session_cache = TTLCache(SESSION_CACHE_SIZE, SESSION_CACHE_TTL_SECONDS)
 
 
-def _truncate(password: str) -> bytes:
-    pwd_bytes = password.encode("utf-8")
-    return pwd_bytes[:MAX_BCRYPT_BYTES]
-
-def hash_password(password: str) -> str:
-    return pwd_context.hash(_truncate(password))
-
-def verify_password(password: str, hashed: str) -> bool:
-    return pwd_context.verify(_truncate(password), hashed)
-
-def login(email, password):
-    session = SessionLocal()
-
-    user = session.execute(text("""
+async def login(session, email, password):
+    result = await session.execute(text("""
         SELECT employee_id, password
         FROM employees
         WHERE email=:email
-    """), {"email": email}).fetchone()
+    """), {"email": email})
+    user = result.fetchone()
 
     if not user:
         return None
 
     m = user._mapping
 
-    if not verify_password(password, m["password"]):
+    # Return the connection before queueing for a bcrypt worker; the
+    # UPDATE/INSERT below check one out again.
+    await session.close()
+
+    valid, new_hash = await password_pool.run(
+        verify_and_update, password, m["password"]
+    )
+
+    if not valid:
         return None
 
+    if new_hash:
+        await session.execute(text("""
+            UPDATE employees
+            SET password=:h
+            WHERE employee_id=:uid
+        """), {"h": new_hash, "uid": m["employee_id"]})
+
     token = str(uuid.uuid4())
 
-    session.execute(text("""
-        INSERT INTO employee_sessions(token, employee_id)
-        VALUES(:t, :uid)
-    """), {"t": token, "uid": m["employee_id"]})
+    await session.execute(text("""
+        INSERT INTO employee_sessions(token, employee_id, expires_at)
+        VALUES(:t, :uid, now() + make_interval(secs => :ttl))
+    """), {
+        "t": token,
+        "uid": m["employee_id"],
+        "ttl": SESSION_TTL_SECONDS
+    })
 
-    session.commit()
-    session.close()
+    await session.commit()
+
+    session_cache.put(
+        token,
+        m["employee_id"],
+        min(SESSION_CACHE_TTL_SECONDS, SESSION_TTL_SECONDS),
+    )
 
     return token
 
 
-def get_employee(token):
-    session = SessionLocal()
+async def logout(session, token):
+    session_cache.pop(token)
+
+    await session.execute(text("""
+        DELETE FROM employee_sessions
+        WHERE token=:t
+    """), {"t": token})
+
+    await session.commit()
+
+
+async def get_employee(session, token):
+    employee_id = session_cache.get(token)
 
-    row = session.execute(text("""
-        SELECT employee_id
+    if employee_id is not None:
+        return employee_id
+
+    result = await session.execute(text("""
+        SELECT employee_id,
+               EXTRACT(EPOCH FROM expires_at - now()) AS remaining
         FROM employee_sessions
         WHERE token=:t
-    """), {"t": token}).fetchone()
+        AND expires_at > now()
+    """), {"t": token})
+    row = result.fetchone()
+
+    if not row:
+        return None
+
+    m = row._mapping
+
+    # Never cache a token past its own expiry.
+    session_cache.put(
+        token,
+        m["employee_id"],
+        min(SESSION_CACHE_TTL_SECONDS, float(m["remaining"])),
+    )
+
+    return m["employee_id"]
+
+
+async def purge_expired_sessions():
+    async with db.AsyncSessionLocal() as session:
+        result = await session.execute(text("""
+            DELETE FROM employee_sessions
+            WHERE expires_at <= now()
+        """))
+
+        await session.commit()
+
+    return result.rowcount
+
+
+async def purge_sessions_forever():
+    """
+    Background task started from the API lifespan.
+    """
 
-    session.close()
+    while True:
+        await asyncio.sleep(SESSION_PURGE_INTERVAL_SECONDS)
 
-    return row._mapping["employee_id"] if row else None
+        try:
+            purged = await purge_expired_sessions()
+            if purged:
+                print(f"Purged {purged} expired sessions")
+        except Exception as e:
+            print(f"Session purge failed: {e}")
 
 security = HTTPBearer()
 
 
-def get_current_employee(
-    credentials: HTTPAuthorizationCredentials = Depends(security),):
+async def get_current_employee(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    session: AsyncSession = Depends(get_db),):
     token = credentials.credentials
 
-    employee_id = get_employee(token)
+    employee_id = await get_employee(session, token)
+    # Don't keep a pooled connection idle in transaction for the rest of
+    # the request; the handler's next query checks one out again.
+    await session.close()
 
     if not employee_id:
         raise HTTPException(401, "Invalid or expired session")
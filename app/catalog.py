@@ -0,0 +1,177 @@
+import asyncio
+import os
+import re
+import time
+
+from sqlalchemy import text
+from app import db
+from app.prerequisites import PrerequisiteGraph
+from app.embedding_cache import normalize
+from app.name_matcher import NameMatcher
+
+CATALOG_REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "30"))
+
+
+def level_number(level) -> int:
+    digits = re.sub(r"\D", "", level or "")
+    return int(digits) if digits else 0
+
+
+class CompetencyRecord:
+    __slots__ = (
+        "competency_id",
+        "competency_name",
+        "proficiency_level_name",
+        "pre_requisite_id",
+    )
+
+    def __init__(
+        self,
+        competency_id,
+        competency_name,
+        proficiency_level_name,
+        pre_requisite_id,
+    ):
+        self.competency_id = competency_id
+        self.competency_name = competency_name
+        self.proficiency_level_name = proficiency_level_name
+        self.pre_requisite_id = pre_requisite_id
+
+    def as_dict(self):
+        return {f: getattr(self, f) for f in self.__slots__}
+
+
+class CatalogSnapshot:
+    """
+    Read-only view of competency_catalog for the roadmap and path lookups.
+    Names are keyed by normalize() (case and whitespace insensitive), the
+    same form the matcher returns; levels are sorted numerically.
+    """
+
+    __slots__ = (
+        "by_id",
+        "records_by_name",
+        "levels_by_name",
+        "prerequisites",
+        "graph",
+        "matcher",
+    )
+
+    def __init__(self, records):
+        self.by_id = {r.competency_id: r for r in records}
+        self.prerequisites = {
+            r.competency_id: r.pre_requisite_id for r in records
+        }
+        self.graph = PrerequisiteGraph(self.prerequisites)
+
+        grouped = {}
+        for r in records:
+            grouped.setdefault(normalize(r.competency_name or ""), []).append(r)
+
+        self.records_by_name = {
+            name: tuple(sorted(
+                rs,
+                key=lambda r: (level_number(r.proficiency_level_name), r.competency_id),
+            ))
+            for name, rs in grouped.items()
+        }
+        self.levels_by_name = {
+            name: tuple(sorted(
+                {r.proficiency_level_name for r in rs},
+                key=level_number,
+            ))
+            for name, rs in self.records_by_name.items()
+        }
+        self.matcher = NameMatcher(self.records_by_name)
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def levels(self, name: str):
+        return self.levels_by_name.get(normalize(name), ())
+
+    def records(self, name: str):
+        return self.records_by_name.get(normalize(name), ())
+
+    def find_in(self, question: str, fuzzy: bool = True):
+        """
+        Key of the longest competency name contained in the question,
+        falling back to the closest near-miss when fuzzy; else None.
+        """
+
+        return self.matcher.find(question, fuzzy)
+
+
+class CatalogStore:
+    """
+    Holds the current CatalogSnapshot and rebuilds it when the
+    competency_catalog_changes log has entries from any transaction that
+    was still running when it was built (xmin). Readers never wait on a
+    refresh once a snapshot exists.
+    """
+
+    def __init__(self):
+        self.snapshot = None
+        self.xmin = None
+        self.checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def current(self) -> CatalogSnapshot:
+        if self.snapshot is not None and (
+            time.monotonic() - self.checked_at < CATALOG_REFRESH_SECONDS
+        ):
+            return self.snapshot
+
+        if self._lock.locked() and self.snapshot is not None:
+            return self.snapshot
+
+        async with self._lock:
+            if self.snapshot is None or (
+                time.monotonic() - self.checked_at >= CATALOG_REFRESH_SECONDS
+            ):
+                await self.refresh()
+
+        return self.snapshot
+
+    async def refresh(self, force: bool = False):
+        async with db.AsyncSessionLocal() as session:
+            marks = (await session.execute(
+                text("""
+                SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint AS xmin,
+                       EXISTS (
+                           SELECT 1
+                           FROM public.competency_catalog_changes
+                           WHERE xid >= CAST(CAST(:xmin AS text) AS xid8)
+                       ) AS changed
+                """),
+                {"xmin": str(self.xmin or 0)}
+            )).fetchone()
+
+            self.checked_at = time.monotonic()
+
+            if not force and self.snapshot is not None and not marks.changed:
+                self.xmin = marks.xmin
+                return
+
+            rows = (await session.execute(text("""
+                SELECT competency_id,
+                       competency_name,
+                       proficiency_level_name,
+                       pre_requisite_id
+                FROM public.competency_catalog
+                ORDER BY competency_id
+            """))).fetchall()
+
+        snapshot = CatalogSnapshot([CompetencyRecord(*r) for r in rows])
+
+        if snapshot.graph.cyclic:
+            print(
+                "Prerequisite cycle among competencies: "
+                f"{snapshot.graph.cyclic}"
+            )
+
+        self.snapshot = snapshot
+        self.xmin = marks.xmin
+
+
+catalog_store = CatalogStore()
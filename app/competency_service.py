@@ -1,28 +1,33 @@
 from sqlalchemy import text
-from app.db import SessionLocal
 import re
+from app.catalog import catalog_store, level_number
+from app.embedding_cache import normalize
+from app.prerequisites import is_completed
 
-def can_start_competency(employee_id, competency_id):
-    session = SessionLocal()
 
-    prereq = session.execute(text("""
-        SELECT pre_requisite_id
-        FROM competency_catalog
-        WHERE competency_id=:cid
-    """), {"cid": competency_id}).fetchone()
+async def completed_competencies(session, employee_id):
+    rows = (await session.execute(text("""
+        SELECT competency_id, status
+        FROM employee_competency
+        WHERE employee_id=:eid
+    """), {"eid": employee_id})).fetchall()
 
-    # No prerequisite
-    if not prereq:
-        session.close()
-        return True
+    return {
+        r._mapping["competency_id"]
+        for r in rows
+        if is_completed(r._mapping["status"])
+    }
 
-    prereq_id = prereq._mapping["pre_requisite_id"]
 
+async def can_start_competency(session, employee_id, competency_id):
+    catalog = await catalog_store.current()
+    prereq_id = catalog.prerequisites.get(competency_id)
+
+    # No prerequisite
     if not prereq_id:
-        session.close()
         return True
 
-    status = session.execute(text("""
+    status = (await session.execute(text("""
         SELECT status
         FROM employee_competency
         WHERE employee_id=:eid
@@ -30,169 +35,104 @@ def can_start_competency(employee_id, competency_id):
     """), {
         "eid": employee_id,
         "pid": prereq_id
-    }).fetchone()
-
-    session.close()
-
-    if not status:
-        return False
-
-    return status._mapping["status"] == "COMPLETED"
-
-def get_next_competency(employee_id):
-    session = SessionLocal()
-
-    rows = session.execute(text("""
-        SELECT c.competency_id,
-               c.competency_name,
-               c.pre_requisite_id
-        FROM competency_catalog c
-        WHERE c.competency_id NOT IN (
-            SELECT competency_id
-            FROM employee_competency
-            WHERE employee_id=:eid
-            AND status='COMPLETED'
-        )
-    """), {"eid": employee_id}).fetchall()
-
-    for r in rows:
-        m = r._mapping
-        prereq = m["pre_requisite_id"]
-
-        if prereq is None:
-            session.close()
-            return m
-
-        status = session.execute(text("""
-            SELECT status
-            FROM employee_competency
-            WHERE employee_id=:eid
-            AND competency_id=:pid
-        """), {
-            "eid": employee_id,
-            "pid": prereq
-        }).fetchone()
-
-        if status and status._mapping["status"] == "COMPLETED":
-            session.close()
-            return m
-
-    session.close()
-    return None
+    })).fetchone()
 
-from sqlalchemy import text
-from app.db import SessionLocal
+    completed = set()
+    if status and is_completed(status._mapping["status"]):
+        completed.add(prereq_id)
 
+    return catalog.graph.can_start(competency_id, completed)
 
-def get_competency_path(name):
-    session = SessionLocal()
 
-    rows = session.execute(text("""
-        SELECT competency_id,
-               competency_name,
-               proficiency_level_name,
-               pre_requisite_id
-        FROM competency_catalog
-        WHERE competency_name ILIKE :name
-        ORDER BY  CAST(
-                regexp_replace(
-                    proficiency_level_name,
-                    '[^0-9]',
-                    '',
-                    'g'
-                ) AS INT
-            )
+async def next_competencies(session, employee_id, limit=None):
+    """
+    Competencies the employee can start now, in prerequisite order,
+    from one fetch of their statuses.
+    """
 
-    """), {"name": f"%{name}%"}).fetchall()
+    catalog = await catalog_store.current()
+    completed = await completed_competencies(session, employee_id)
 
-    session.close()
+    unlocked = catalog.graph.unlocked(completed)
 
-    return [dict(r._mapping) for r in rows]
+    if limit is not None:
+        unlocked = unlocked[:limit]
 
-from sqlalchemy import text
-from app.db import SessionLocal
+    return [catalog.by_id[cid] for cid in unlocked]
+
+
+async def get_next_competency(session, employee_id):
+    records = await next_competencies(session, employee_id, limit=1)
+
+    if not records:
+        return None
+
+    r = records[0]
+
+    return {
+        "competency_id": r.competency_id,
+        "competency_name": r.competency_name,
+        "pre_requisite_id": r.pre_requisite_id,
+    }
+
+
+async def get_competency_path(name):
+    catalog = await catalog_store.current()
+    needle = normalize(name)
 
+    rows = [
+        r
+        for key, records in catalog.records_by_name.items()
+        if needle in key
+        for r in records
+    ]
+    rows.sort(key=lambda r: level_number(r.proficiency_level_name))
 
-def get_competency_path_from_question(question: str):
-    session = SessionLocal()
+    return [r.as_dict() for r in rows]
+
+
+async def get_competency_path_from_question(question: str):
+    catalog = await catalog_store.current()
 
     # Find competency referenced in question
-    comp = session.execute(text("""
-        SELECT DISTINCT competency_name
-        FROM competency_catalog
-        WHERE :q ILIKE '%' || competency_name || '%'
-        LIMIT 1
-    """), {"q": question}).fetchone()
-
-    if not comp:
-        session.close()
+    name = catalog.find_in(question)
+
+    if name is None:
         return []
 
-    comp_name = comp._mapping["competency_name"]
-
-    # Fetch all levels of that competency
-    rows = session.execute(text("""
-        SELECT competency_id,
-               competency_name,
-               proficiency_level_name
-        FROM competency_catalog
-        WHERE competency_name = :name
-        ORDER BY
-            CAST(
-                regexp_replace(
-                    proficiency_level_name,
-                    '[^0-9]',
-                    '',
-                    'g'
-                ) AS INT
-            )
-    """), {"name": comp_name}).fetchall()
-
-    session.close()
-
-    return [dict(r._mapping) for r in rows]
-
-
-def get_sequence_until_level(question: str):
-    session = SessionLocal()
-
-    try:
-        # Extract requested level (E1 etc.)
-        match = re.search(r'E\d+', question, re.IGNORECASE)
-        target_level = match.group(0).upper() if match else None
-
-        # Find competency mentioned
-        comp = session.execute(text("""
-            SELECT competency_name
-            FROM competency_catalog
-            WHERE :q ILIKE '%' || competency_name || '%'
-            LIMIT 1
-        """), {"q": question}).fetchone()
-
-        if not comp:
-            return None
-
-        comp_name = comp._mapping["competency_name"]
-
-        # Fetch all levels
-        rows = session.execute(text("""
-            SELECT proficiency_level_name
-            FROM competency_catalog
-            WHERE competency_name = :name
-        """), {"name": comp_name}).fetchall()
-
-        # Deduplicate + sort numerically
-        levels = sorted(
-            {r._mapping["proficiency_level_name"] for r in rows},
-            key=lambda x: int(re.sub(r"\D", "", x or "0") or 0)
-        )
-
-        if not target_level or target_level not in levels:
-            return comp_name, levels
-
-        idx = levels.index(target_level)
-
-        return comp_name, levels[:idx + 1]
-
-    finally:
-        session.close()
+    records = catalog.records(name)
+
+    return [
+        {
+            "competency_id": r.competency_id,
+            "competency_name": r.competency_name,
+            "proficiency_level_name": r.proficiency_level_name,
+        }
+        for r in records
+    ]
+
+
+async def get_sequence_until_level(question: str):
+    # Extract requested level (E1 etc.)
+    match = re.search(r'E\d+', question, re.IGNORECASE)
+    target_level = match.group(0).upper() if match else None
+
+    catalog = await catalog_store.current()
+
+    # Find competency mentioned
+    name = catalog.find_in(question)
+
+    records = catalog.records(name) if name is not None else ()
+
+    if not records:
+        return None
+
+    comp_name = records[0].competency_name
+    levels = list(catalog.levels(name))
+
+    if not target_level or target_level not in levels:
+        return comp_name, levels
+
+    idx = levels.index(target_level)
+
+    return comp_name, levels[:idx + 1]
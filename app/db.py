@@ -1,18 +1,156 @@
 import os
-from sqlalchemy import create_engine
+from functools import lru_cache
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
 
 load_dotenv()
 
-DATABASE_URL = (
-    f"postgresql+psycopg2://{os.getenv('DB_USER')}:"
+DB_CREDENTIALS = (
+    f"{os.getenv('DB_USER')}:"
     f"{os.getenv('DB_PASSWORD')}@"
     f"{os.getenv('DB_HOST')}:"
     f"{os.getenv('DB_PORT')}/"
     f"{os.getenv('DB_NAME')}"
 )
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(bind=engine)
-print(DATABASE_URL)
\ No newline at end of file
+DATABASE_URL = f"postgresql+psycopg2://{DB_CREDENTIALS}"
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DB_CREDENTIALS}"
+
+# ANN search breadth applied to every pooled connection; empty keeps the
+# pgvector defaults. Tune with `python -m app.ann_index bench`.
+HNSW_EF_SEARCH = os.getenv("HNSW_EF_SEARCH", "")
+IVFFLAT_PROBES = os.getenv("IVFFLAT_PROBES", "")
+
+# Pool settings for the API's async engine.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+
+# Engines and session factories are created on first use, so importing
+# this module neither loads the database drivers nor builds a pool.
+# `engine`, `SessionLocal`, `async_engine` and `AsyncSessionLocal` remain
+# importable by name (see __getattr__ below).
+
+@lru_cache(maxsize=None)
+def get_engine():
+    # Sync engine for ingest and the command line tools. No statement
+    # timeout: bulk updates and index builds legitimately run for a long time.
+    engine = create_engine(DATABASE_URL, pool_pre_ping=DB_POOL_PRE_PING)
+    event.listen(engine, "connect", _on_connect)
+    return engine
+
+
+@lru_cache(maxsize=None)
+def get_async_engine():
+    # Async engine for the API request path.
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args={
+            "server_settings": {
+                "statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)
+            }
+        },
+    )
+    event.listen(async_engine.sync_engine, "connect", _on_async_connect)
+    return async_engine
+
+
+@lru_cache(maxsize=None)
+def get_sessionmaker():
+    return sessionmaker(bind=get_engine())
+
+
+@lru_cache(maxsize=None)
+def get_async_sessionmaker():
+    return async_sessionmaker(get_async_engine(), expire_on_commit=False)
+
+
+_LAZY = {
+    "engine": get_engine,
+    "SessionLocal": get_sessionmaker,
+    "async_engine": get_async_engine,
+    "AsyncSessionLocal": get_async_sessionmaker,
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    return _LAZY[name]()
+
+
+async def get_db():
+    """
+    FastAPI dependency: one session per request, always closed (and its
+    connection returned to the pool) when the request finishes. Handlers
+    that go on to slow work (LLM calls, streaming) close it first: the
+    session stays usable, but holds no connection until its next query.
+    """
+
+    async with get_async_sessionmaker()() as session:
+        yield session
+
+
+def pool_stats():
+    pool = get_async_engine().pool
+
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": DB_MAX_OVERFLOW,
+    }
+
+
+def _search_settings():
+    settings = []
+
+    if HNSW_EF_SEARCH:
+        settings.append(f"SET hnsw.ef_search = {int(HNSW_EF_SEARCH)}")
+
+    if IVFFLAT_PROBES:
+        settings.append(f"SET ivfflat.probes = {int(IVFFLAT_PROBES)}")
+
+    return settings
+
+
+def _on_connect(dbapi_connection, connection_record):
+    from pgvector.psycopg2 import register_vector
+
+    # Lets numpy float32 arrays bind directly as vector parameters.
+    register_vector(dbapi_connection)
+
+    cursor = dbapi_connection.cursor()
+
+    for statement in _search_settings():
+        cursor.execute(statement)
+
+    cursor.close()
+    # Commit so the SETs survive the pool's rollback-on-return.
+    dbapi_connection.commit()
+
+
+async def _init_asyncpg(conn):
+    from pgvector.asyncpg import register_vector
+
+    # asyncpg sends vectors over the binary protocol with this codec.
+    await register_vector(conn)
+
+    for statement in _search_settings():
+        await conn.execute(statement)
+
+
+def _on_async_connect(dbapi_connection, connection_record):
+    dbapi_connection.run_async(_init_asyncpg)
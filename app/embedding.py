@@ -1,21 +1,163 @@
 import requests
 import os
+import httpx
+import numpy as np
 from dotenv import load_dotenv
-from pgvector.sqlalchemy import Vector
+from requests.adapters import HTTPAdapter
+from app.embedding_cache import EmbeddingCache, normalize
+from app.single_flight import SingleFlight
 
 load_dotenv()
 
 OLLAMA_URL = os.getenv("OLLAMA_BASE_URL")
+EMBED_MODEL = os.getenv("EMBED_MODEL", "nomic-embed-text")
+# Width of EMBED_MODEL's vectors; sizes the quantized catalog columns.
+EMBED_DIMENSIONS = int(os.getenv("EMBED_DIMENSIONS", "768"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+OLLAMA_POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", "16"))
+OLLAMA_TIMEOUT_SECONDS = float(os.getenv("OLLAMA_TIMEOUT_SECONDS", "600"))
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "4096"))
+# Empty string keeps the cache in memory only.
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", ".cache/embeddings.sqlite3")
+# How long Ollama keeps a model loaded after each request: a duration
+# such as "30m", or a number of seconds (-1 keeps it loaded for good).
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+if OLLAMA_KEEP_ALIVE.lstrip("-").isdigit():
+    OLLAMA_KEEP_ALIVE = int(OLLAMA_KEEP_ALIVE)
 
-def get_embedding(text: str) ->str:
-    response = requests.post(
-        f"{OLLAMA_URL}/api/embeddings",
-        json={
-            "model": "nomic-embed-text",
-            "prompt": text
-        }
-    )
-    response.raise_for_status()
-
-    embedding = response.json()["embedding"]
-    return "[" + ",".join(map(str, embedding)) + "]"
\ No newline at end of file
+# One keep-alive session for every Ollama call in the process, so
+# requests reuse pooled TCP connections instead of reconnecting.
+ollama_http = requests.Session()
+ollama_http.mount(
+    "http://",
+    HTTPAdapter(pool_connections=1, pool_maxsize=OLLAMA_POOL_SIZE),
+)
+ollama_http.mount(
+    "https://",
+    HTTPAdapter(pool_connections=1, pool_maxsize=OLLAMA_POOL_SIZE),
+)
+
+# Async counterpart used by the API request path. Connections are capped
+# at the pool size; callers beyond that wait for a free connection.
+ollama_async_http = httpx.AsyncClient(
+    base_url=OLLAMA_URL or "",
+    limits=httpx.Limits(
+        max_connections=OLLAMA_POOL_SIZE,
+        max_keepalive_connections=OLLAMA_POOL_SIZE,
+    ),
+    timeout=httpx.Timeout(OLLAMA_TIMEOUT_SECONDS, connect=10.0),
+)
+
+embedding_cache = EmbeddingCache(EMBED_CACHE_SIZE, EMBED_CACHE_PATH or None)
+# Identical query embeddings requested concurrently share one Ollama call.
+embed_flight = SingleFlight()
+
+
+def get_embeddings(texts, batch_size: int = EMBED_BATCH_SIZE) -> np.ndarray:
+    """
+    Embed many texts with Ollama's multi-input /api/embed endpoint.
+    Returns a float32 matrix with one row per input text.
+    """
+
+    texts = list(texts)
+    batches = []
+
+    for start in range(0, len(texts), batch_size):
+        response = ollama_http.post(
+            f"{OLLAMA_URL}/api/embed",
+            json={
+                "model": EMBED_MODEL,
+                "keep_alive": OLLAMA_KEEP_ALIVE,
+                "input": texts[start:start + batch_size]
+            }
+        )
+        response.raise_for_status()
+
+        batches.append(
+            np.asarray(response.json()["embeddings"], dtype=np.float32)
+        )
+
+    if not batches:
+        return np.empty((0, 0), dtype=np.float32)
+
+    return np.vstack(batches)
+
+
+def get_embedding(text: str) -> np.ndarray:
+    """
+    Embed a single query, served from the embedding cache when the same
+    normalized text has been embedded before.
+    """
+
+    cached = embedding_cache.get(EMBED_MODEL, text)
+
+    if cached is not None:
+        return cached
+
+    embedding = get_embeddings([text])[0]
+    embedding_cache.put(EMBED_MODEL, text, embedding)
+
+    return embedding
+
+
+
+async def get_embeddings_async(
+    texts,
+    batch_size: int = EMBED_BATCH_SIZE,
+) -> np.ndarray:
+    texts = list(texts)
+    batches = []
+
+    for start in range(0, len(texts), batch_size):
+        response = await ollama_async_http.post(
+            "/api/embed",
+            json={
+                "model": EMBED_MODEL,
+                "keep_alive": OLLAMA_KEEP_ALIVE,
+                "input": texts[start:start + batch_size]
+            }
+        )
+        response.raise_for_status()
+
+        batches.append(
+            np.asarray(response.json()["embeddings"], dtype=np.float32)
+        )
+
+    if not batches:
+        return np.empty((0, 0), dtype=np.float32)
+
+    return np.vstack(batches)
+
+
+async def get_embedding_async(text: str) -> np.ndarray:
+    cached = await embedding_cache.get_async(EMBED_MODEL, text)
+
+    if cached is not None:
+        return cached
+
+    async def embed():
+        embedding = (await get_embeddings_async([text]))[0]
+        await embedding_cache.put_many_async(EMBED_MODEL, [(text, embedding)])
+        return embedding
+
+    embedding, _ = await embed_flight.do((EMBED_MODEL, normalize(text)), embed)
+
+    return embedding
+
+
+async def get_embeddings_cached_async(texts) -> list:
+    """
+    Embeddings for many texts: cache hits are reused, the misses are
+    embedded together in batches and cached.
+    """
+
+    texts = list(texts)
+    found = await embedding_cache.get_many_async(EMBED_MODEL, texts)
+    missing = [t for t, e in found.items() if e is None]
+
+    if missing:
+        embedded = list(zip(missing, await get_embeddings_async(missing)))
+        await embedding_cache.put_many_async(EMBED_MODEL, embedded)
+        found.update(embedded)
+
+    return [found[t] for t in texts]
@@ -0,0 +1,191 @@
+import asyncio
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache for query embeddings: a bounded in-process LRU in
+    front of a SQLite file that survives restarts and is shared by all
+    workers on the host. Keys are (model, normalized text).
+
+    The disk tier is best-effort: a locked or failing SQLite file only
+    costs cache hits. The *_async methods run it in a thread so it never
+    blocks the event loop.
+    """
+
+    def __init__(self, max_entries: int, path: str | None):
+        self.max_entries = max_entries
+        self.path = path
+        self._memory = OrderedDict()
+        # _lock guards the LRU only, so event-loop lookups never wait on
+        # disk I/O; _db_lock serializes use of the shared connection.
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    PRIMARY KEY (model, text)
+                )
+            """)
+            self._db.commit()
+
+    def get(self, model: str, text: str):
+        key = (model, normalize(text))
+        vector = self._memory_get(key)
+
+        if vector is None and self._db is not None:
+            vector = self._disk_get(key)
+
+        return self._counted(vector)
+
+    async def get_async(self, model: str, text: str):
+        key = (model, normalize(text))
+        vector = self._memory_get(key)
+
+        if vector is None and self._db is not None:
+            vector = await asyncio.to_thread(self._disk_get, key)
+
+        return self._counted(vector)
+
+    async def get_many_async(self, model: str, texts):
+        """
+        {text: vector or None}; disk lookups for all memory misses share
+        one thread hop.
+        """
+
+        keys = {t: (model, normalize(t)) for t in set(texts)}
+        found = {t: self._memory_get(key) for t, key in keys.items()}
+        missing = [t for t, v in found.items() if v is None]
+
+        if missing and self._db is not None:
+            vectors = await asyncio.to_thread(
+                lambda: [self._disk_get(keys[t]) for t in missing]
+            )
+            found.update(zip(missing, vectors))
+
+        for t in missing:
+            self._counted(found[t])
+
+        return found
+
+    def put(self, model: str, text: str, vector: np.ndarray):
+        key, vector = self._prepare(model, text, vector)
+
+        with self._lock:
+            self._remember(key, vector)
+
+        if self._db is not None:
+            self._disk_put([(key, vector)])
+
+    async def put_many_async(self, model: str, items):
+        """
+        put() for (text, vector) pairs, written to disk in one thread hop
+        and one transaction.
+        """
+
+        entries = [self._prepare(model, text, vector) for text, vector in items]
+
+        with self._lock:
+            for key, vector in entries:
+                self._remember(key, vector)
+
+        if self._db is not None and entries:
+            await asyncio.to_thread(self._disk_put, entries)
+
+    @staticmethod
+    def _prepare(model, text, vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        vector.setflags(write=False)
+        return (model, normalize(text)), vector
+
+    def _memory_get(self, key):
+        with self._lock:
+            vector = self._memory.get(key)
+
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+
+            return vector
+
+    def _counted(self, vector):
+        # Memory hits were counted in _memory_get.
+        if vector is None:
+            with self._lock:
+                self.misses += 1
+
+        return vector
+
+    def _disk_get(self, key):
+        try:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT vector FROM embeddings WHERE model=? AND text=?",
+                    key,
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Embedding cache read failed: {e}")
+            return None
+
+        if not row:
+            return None
+
+        vector = np.frombuffer(row[0], dtype=np.float32)
+
+        with self._lock:
+            self._remember(key, vector)
+            self.disk_hits += 1
+
+        return vector
+
+    def _disk_put(self, entries):
+        try:
+            with self._db_lock:
+                with self._db:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO embeddings(model, text, vector) "
+                        "VALUES(?, ?, ?)",
+                        [(*key, vector.tobytes()) for key, vector in entries],
+                    )
+        except sqlite3.Error as e:
+            # The vectors stay in memory; only persistence is lost.
+            print(f"Embedding cache write failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
@@ -1,6 +1,23 @@
+import argparse
+import hashlib
+import io
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
 from sqlalchemy import text
-from db import SessionLocal
-from embedding import get_embedding
+from app.db import SessionLocal
+from app.embedding import get_embeddings, EMBED_BATCH_SIZE, EMBED_MODEL
+from app.schema import migrate, purge_change_log
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "256"))
+INGEST_MAX_RETRIES = int(os.getenv("INGEST_MAX_RETRIES", "5"))
+INGEST_BACKOFF_SECONDS = float(os.getenv("INGEST_BACKOFF_SECONDS", "1.0"))
+
 
 def build_text(row):
     return f"""
@@ -13,10 +30,39 @@ def build_text(row):
     Proficiency Level: {row.proficiency_level_name}
     """
 
-def ingest():
-    session = SessionLocal()
 
-    rows = session.execute(
+def text_hash(combined_text):
+    return hashlib.sha256(combined_text.encode("utf-8")).hexdigest()
+
+
+def embed_with_retry(texts):
+    """
+    Embed one batch, retrying transient Ollama failures with
+    exponential backoff and jitter.
+    """
+
+    for attempt in range(1, INGEST_MAX_RETRIES + 1):
+        try:
+            return get_embeddings(texts)
+        except requests.RequestException as e:
+            if attempt == INGEST_MAX_RETRIES:
+                raise
+
+            delay = INGEST_BACKOFF_SECONDS * 2 ** (attempt - 1)
+            delay += random.uniform(0, INGEST_BACKOFF_SECONDS)
+            print(f"Embedding batch failed ({e}), retry {attempt} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def stream_stale_rows(session, batch_size, full=False):
+    """
+    Yield batches of (competency_id, text, hash) for rows whose embedding
+    is missing, was built from different text, or came from another model.
+    """
+
+    # stream_results makes psycopg2 use a server-side (named) cursor,
+    # so the catalog is never loaded into memory at once.
+    result = session.execute(
         text("""
         SELECT competency_id,
                competency_name,
@@ -25,29 +71,180 @@ def ingest():
                focus_area,
                sub_focus_area,
                microskills,
-               proficiency_level_name
+               proficiency_level_name,
+               embedding IS NULL AS missing,
+               embedding_hash,
+               embedding_model
         FROM public.competency_catalog
-        WHERE embedding IS NULL
-        """)
-    ).fetchall()
+        ORDER BY competency_id
+        """),
+        execution_options={"stream_results": True},
+    )
 
-    print(f"Found {len(rows)} rows to embed")
+    batch = []
 
-    for row in rows:
+    for row in result:
         combined_text = build_text(row)
-        embedding = get_embedding(combined_text)
-        print(f"Processing for {row}")
-        session.execute(
-            text("""
-            UPDATE public.competency_catalog
-            SET embedding = :embedding
-            WHERE competency_id = :id
-            """),
-            {"embedding": embedding, "id": row.competency_id}
+        digest = text_hash(combined_text)
+
+        stale = (
+            full
+            or row.missing
+            or row.embedding_hash != digest
+            or row.embedding_model != EMBED_MODEL
         )
 
+        if not stale:
+            continue
+
+        batch.append((row.competency_id, combined_text, digest))
+
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def write_embeddings(session, ids, hashes, embeddings, quantized=False):
+    """
+    COPY a chunk of embeddings into a temp table and apply them with a
+    single UPDATE ... FROM, then commit so finished work survives a
+    later failure.
+    """
+
+    buf = io.StringIO()
+    for competency_id, digest, embedding in zip(ids, hashes, embeddings):
+        vector = ",".join(map(str, embedding.tolist()))
+        buf.write(f"{competency_id}\t{digest}\t[{vector}]\n")
+    buf.seek(0)
+
+    cursor = session.connection().connection.cursor()
+    cursor.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS embedding_stage (
+            competency_id INT PRIMARY KEY,
+            embedding_hash TEXT,
+            embedding vector
+        ) ON COMMIT DELETE ROWS
+    """)
+    cursor.copy_expert(
+        "COPY embedding_stage (competency_id, embedding_hash, embedding) "
+        "FROM STDIN",
+        buf,
+    )
+    # The quantized copies exist only where pgvector supports them.
+    quantized_columns = """
+            embedding_half = s.embedding::halfvec,
+            embedding_bit = binary_quantize(s.embedding),""" if quantized else ""
+    cursor.execute(f"""
+        UPDATE public.competency_catalog c
+        SET embedding = s.embedding,{quantized_columns}
+            embedding_hash = s.embedding_hash,
+            embedding_model = %s
+        FROM embedding_stage s
+        WHERE c.competency_id = s.competency_id
+    """, (EMBED_MODEL,))
+    cursor.close()
+
     session.commit()
-    session.close()
+
+
+def ingest(full=False):
+    read_session = SessionLocal()
+    write_session = SessionLocal()
+
+    quantized = migrate(write_session)
+
+    pending_ids, pending_hashes, pending_embeddings = [], [], []
+    in_flight = deque()
+    done = 0
+    started = time.monotonic()
+
+    def flush():
+        nonlocal done
+
+        if not pending_ids:
+            return
+
+        write_embeddings(
+            write_session,
+            pending_ids,
+            pending_hashes,
+            pending_embeddings,
+            quantized,
+        )
+        done += len(pending_ids)
+        pending_ids.clear()
+        pending_hashes.clear()
+        pending_embeddings.clear()
+
+        elapsed = time.monotonic() - started
+        print(f"Committed {done} rows ({done / elapsed:.1f} rows/s)")
+
+    def collect(item):
+        future, ids, hashes = item
+        embeddings = future.result()
+        pending_ids.extend(ids)
+        pending_hashes.extend(hashes)
+        pending_embeddings.extend(embeddings)
+
+        if len(pending_ids) >= INGEST_CHUNK_SIZE:
+            flush()
+
+    try:
+        with ThreadPoolExecutor(max_workers=INGEST_WORKERS) as pool:
+            batches = stream_stale_rows(read_session, EMBED_BATCH_SIZE, full)
+
+            for batch in batches:
+                ids, texts, hashes = zip(*batch)
+                future = pool.submit(embed_with_retry, list(texts))
+                in_flight.append((future, ids, hashes))
+
+                # Bound the number of batches waiting on Ollama so a
+                # large catalog doesn't pile up in memory.
+                if len(in_flight) >= INGEST_WORKERS * 2:
+                    collect(in_flight.popleft())
+
+            while in_flight:
+                collect(in_flight.popleft())
+
+            flush()
+
+        purge_change_log(write_session)
+
+    except Exception:
+        # Keep everything that was embedded before the failure; a rerun
+        # only re-embeds rows whose stored hash is still out of date.
+        for future, ids, hashes in in_flight:
+            if future.done() and not future.exception():
+                pending_ids.extend(ids)
+                pending_hashes.extend(hashes)
+                pending_embeddings.extend(future.result())
+
+        try:
+            flush()
+        except Exception as e:
+            print(f"Could not save partial chunk: {e}")
+        raise
+
+    finally:
+        read_session.close()
+        write_session.close()
+
+    elapsed = time.monotonic() - started
+    print(f"Embedded {done} rows in {elapsed:.1f}s")
+
 
 if __name__ == "__main__":
-    ingest()
\ No newline at end of file
+    parser = argparse.ArgumentParser(
+        description="Embed competency_catalog rows whose text or model changed."
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="re-embed every row regardless of stored hash",
+    )
+    args = parser.parse_args()
+
+    ingest(full=args.full)
@@ -1,15 +1,41 @@
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Form
-from app.rag import retrieve_context, generate_answer, ask_question
-from app.auth import login
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi import Request
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from pydantic import BaseModel
+from app.rag import retrieve_context, retrieve_hybrid, ask_question
+from app.rag import retrieve_context_batch
+from app.rag import stream_answer, generate_answer_cached, cache_key
+from app.rag import answer_flight
+from app.answer_cache import answer_cache
+from app.embedding import embedding_cache, embed_flight
+from app.auth import session_cache
+from app.rag import RETRIEVAL_BACKEND, LLM_MODEL
+from app.metrics import ADVISOR_BRANCH, StatsCollector, note, stage, start_request
+from app.embedding import ollama_async_http
+from app.vector_index import catalog_index
+from app.catalog import catalog_store
+from app.warmup import MODEL_WARMUP, warm_models, warm_state
+from app.auth import login, logout, purge_sessions_forever
+from app.passwords import password_pool, PasswordPoolBusy
+from fastapi import HTTPException
+from app.schema import check_schema
 from app.auth import get_employee , get_current_employee
 from app.competency_service import can_start_competency
 from app.competency_service import get_competency_path_from_question
 from app.competency_service import get_competency_path
 from app.competency_service import get_sequence_until_level
-from app.db import SessionLocal
+from app import db
+from app.db import get_db, pool_stats
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 import re
-from app.competency_service import get_next_competency
+from app.competency_service import get_next_competency, next_competencies
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi import Depends
 from app.advisor_eval import evaluate_answer
@@ -18,35 +44,290 @@ from app.advisor_eval import evaluate_answer
 
 security = HTTPBearer()
 
+# /ask/batch: questions accepted per call, and answers generated at once.
+ASK_BATCH_MAX_QUESTIONS = int(os.getenv("ASK_BATCH_MAX_QUESTIONS", "1000"))
+ASK_BATCH_CONCURRENCY = int(os.getenv("ASK_BATCH_CONCURRENCY", "4"))
 
 
-app = FastAPI(title="Competency RAG API")
+
+def verify_schema():
+    # Migrations are a deploy step (`python -m app.schema`): their DDL
+    # locks competency_catalog, which must not happen on a worker restart.
+    session = db.SessionLocal()
+
+    try:
+        check_schema(session, require_quantized=RETRIEVAL_BACKEND == "quantized")
+    finally:
+        session.close()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Model loading overlaps the rest of startup; /ready reports progress.
+    warmup = asyncio.create_task(warm_models()) if MODEL_WARMUP else None
+
+    await run_in_threadpool(verify_schema)
+
+    await catalog_store.refresh()
+
+    if RETRIEVAL_BACKEND == "numpy":
+        await run_in_threadpool(catalog_index.maybe_refresh)
+
+    session_purge = asyncio.create_task(purge_sessions_forever())
+    warm_state.started = True
+
+    yield
+
+    if warmup is not None:
+        warmup.cancel()
+    session_purge.cancel()
+    password_pool.shutdown()
+    await ollama_async_http.aclose()
+    await db.async_engine.dispose()
+
+
+app = FastAPI(title="Competency RAG API", lifespan=lifespan)
+
+REGISTRY.register(StatsCollector({
+    "db_pool": pool_stats,
+    "password_pool": password_pool.stats,
+    "embedding_cache": embedding_cache.stats,
+    "answer_cache": answer_cache.stats,
+    "session_cache": session_cache.stats,
+    "embed_flight": embed_flight.stats,
+    "answer_flight": answer_flight.stats,
+}))
+
+
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    """
+    Collect per-stage timings for the request and report them in a
+    Server-Timing header. For streamed responses "total" is the time to
+    the response headers, and later stages reach only the histogram.
+    """
+
+    timings = start_request(request.scope)
+
+    with stage("total"):
+        response = await call_next(request)
+
+    if timings.stages:
+        response.headers["Server-Timing"] = timings.server_timing()
+
+    return response
+
+
+def format_sources(context):
+    return [
+        {
+            "competency_name": r.competency_name,
+            "focus_area": r.focus_area,
+            "proficiency": r.proficiency_level_name
+        }
+        for r in context
+    ]
+
+
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_response(events):
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+@app.get("/ready")
+async def ready():
+    """
+    Readiness probe: 200 once startup has finished and both Ollama models
+    are loaded, 503 until then.
+    """
+
+    return JSONResponse(
+        warm_state.report(),
+        status_code=200 if warm_state.ready else 503,
+    )
+
+
+@app.get("/metrics")
+async def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 
 @app.get("/ask")
-def ask(question: str):
-    context = retrieve_context(question)
-    answer = generate_answer(question, context)
+async def ask(question: str):
+    context = await retrieve_context(question)
+    answer, cached = await generate_answer_cached(question, context)
 
     return {
         "question": question,
         "answer": answer,
-        "sources": [
-            {
-                "competency_name": r.competency_name,
-                "focus_area": r.focus_area,
-                "proficiency": r.proficiency_level_name
-            }
-            for r in context
-        ]
+        "sources": format_sources(context),
+        "cached": cached
     }
 
 
+class AskBatchRequest(BaseModel):
+    questions: list[str]
+
+
+async def answer_batch(questions):
+    """
+    Yield (index, result) as each answer completes. Retrieval for the
+    whole batch happens up front; at most ASK_BATCH_CONCURRENCY answers
+    are generated at a time.
+    """
+
+    contexts = await retrieve_context_batch(questions)
+    slots = asyncio.Semaphore(ASK_BATCH_CONCURRENCY)
+
+    async def answer(index):
+        question, context = questions[index], contexts[index]
+
+        async with slots:
+            try:
+                answer, cached = await generate_answer_cached(question, context)
+            except Exception as e:
+                return index, {"question": question, "error": str(e)}
+
+        return index, {
+            "question": question,
+            "answer": answer,
+            "sources": format_sources(context),
+            "cached": cached
+        }
+
+    tasks = [asyncio.create_task(answer(i)) for i in range(len(questions))]
+
+    try:
+        for done in asyncio.as_completed(tasks):
+            yield await done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+@app.post("/ask/batch")
+async def ask_batch(request: AskBatchRequest, stream: bool = False):
+    """
+    /ask for many questions. Returns results in question order, or with
+    stream=true one NDJSON line per answer as soon as it is ready, each
+    carrying the question's index.
+    """
+
+    questions = request.questions
+
+    if len(questions) > ASK_BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            413, f"At most {ASK_BATCH_MAX_QUESTIONS} questions per batch"
+        )
+
+    if stream:
+        async def lines():
+            async for index, result in answer_batch(questions):
+                yield json.dumps({"index": index, **result}) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    results = [None] * len(questions)
+
+    async for index, result in answer_batch(questions):
+        results[index] = result
+
+    return {"results": results}
+
+
+async def stream_answer_cached(question: str, context):
+    """
+    Yield (token, cached) pairs. A cached answer, or one an identical
+    request is already generating, arrives as one token; otherwise tokens
+    are relayed live and the full answer is cached.
+    """
+
+    key = cache_key(question, context)
+    answer = answer_cache.get(key)
+
+    if answer is not None:
+        yield answer, True
+        return
+
+    running = answer_flight.running(key)
+
+    if running is not None:
+        with stage("wait"):
+            answer = await asyncio.shield(running)
+        note("coalesced", 1)
+        yield answer, True
+        return
+
+    tokens = asyncio.Queue()
+
+    async def generate():
+        parts = []
+
+        try:
+            with stage("generate", LLM_MODEL):
+                async for token in stream_answer(question, context):
+                    parts.append(token)
+                    tokens.put_nowait(token)
+        finally:
+            tokens.put_nowait(None)
+
+        answer = "".join(parts)
+        answer_cache.put(key, answer)
+        return answer
+
+    # Generation runs as the flight's task so requests arriving meanwhile
+    # can wait for it, and it finishes even if this client disconnects.
+    task = answer_flight.start(key, generate)
+
+    while (token := await tokens.get()) is not None:
+        yield token, False
+
+    await task
+
+
+@app.get("/ask/stream")
+async def ask_stream(question: str):
+    """
+    Same as /ask, relayed as Server-Sent Events: one "token" event per
+    generated chunk, then a "done" event carrying the sources.
+    """
+
+    async def events():
+        context = await retrieve_context(question)
+        cached = False
+
+        async for token, cached in stream_answer_cached(question, context):
+            yield sse("token", {"text": token})
+
+        yield sse("done", {
+            "question": question,
+            "sources": format_sources(context),
+            "cached": cached
+        })
+
+    return sse_response(events())
+
+
 @app.post("/login")
-def login_api(
+async def login_api(
     email: str = Form(...),
-    password: str = Form(...)
+    password: str = Form(...),
+    session: AsyncSession = Depends(get_db),
 ):
-    token = login(email, password)
+    try:
+        token = await login(session, email, password)
+    except PasswordPoolBusy:
+        raise HTTPException(503, "Too many logins in progress, retry shortly")
 
     if not token:
         return {"error": "Invalid credentials"}
@@ -54,20 +335,32 @@ def login_api(
     return {"token": token}
 
 
+@app.post("/logout")
+async def logout_api(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    session: AsyncSession = Depends(get_db),
+):
+    await logout(session, credentials.credentials)
+
+    return {"message": "Logged out"}
+
+
 @app.post("/start")
-def start_competency(token: str, competency_id: int):
+async def start_competency(
+    token: str,
+    competency_id: int,
+    session: AsyncSession = Depends(get_db),
+):
 
-    emp_id = get_employee(token)
+    emp_id = await get_employee(session, token)
 
     if not emp_id:
         return {"error": "Invalid session"}
 
-    if not can_start_competency(emp_id, competency_id):
+    if not await can_start_competency(session, emp_id, competency_id):
         return {"error": "Prerequisite not completed"}
 
-    session = SessionLocal()
-
-    session.execute(text("""
+    await session.execute(text("""
         INSERT INTO employee_competency(
             employee_id,
             competency_id,
@@ -79,266 +372,279 @@ def start_competency(token: str, competency_id: int):
         DO UPDATE SET status='IN_PROGRESS'
     """), {"e": emp_id, "c": competency_id})
 
-    session.commit()
-    session.close()
+    await session.commit()
 
     return {"message": "Competency started"}
 
 @app.get("/roadmap")
-def roadmap(token: str):
-    emp_id = get_employee(token)
+async def roadmap(token: str, session: AsyncSession = Depends(get_db)):
+    emp_id = await get_employee(session, token)
 
     if not emp_id:
         return {"error": "Invalid session"}
 
-    next_comp = get_next_competency(emp_id)
+    next_comp = await get_next_competency(session, emp_id)
 
     return {"next": next_comp}
 
 @app.get("/my-competencies")
-def my_competencies(employee_id: int = Depends(get_current_employee)):
-    session = SessionLocal()
+async def my_competencies(
+    employee_id: int = Depends(get_current_employee),
+    session: AsyncSession = Depends(get_db),
+):
+    rows = (await session.execute(text("""
+        SELECT c.competency_id,
+               c.competency_name,
+               c.proficiency_level_name,
+               ec.status,
+               ec.progress
+        FROM employee_competency ec
+        JOIN competency_catalog c
+          ON ec.competency_id = c.competency_id
+        WHERE ec.employee_id = :eid
+    GROUP BY
+    c.competency_id,
+    c.competency_name,
+    c.proficiency_level_name,
+    ec.status,
+    ec.progress
+    """), {"eid": employee_id})).fetchall()
+
+    return [
+        {
+            "competency_id": r._mapping["competency_id"],
+            "competency_name": r._mapping["competency_name"],
+            "proficiency_level_name": r._mapping["proficiency_level_name"],
+            "status": r._mapping["status"],
+            "progress": r._mapping.get("progress", 0),
+        }
+        for r in rows
+    ]
 
-    try:
-        rows = session.execute(text("""
-            SELECT c.competency_id,
-                   c.competency_name,
-                   c.proficiency_level_name,
-                   ec.status,
-                   ec.progress
-            FROM employee_competency ec
-            JOIN competency_catalog c
-              ON ec.competency_id = c.competency_id
-            WHERE ec.employee_id = :eid
-        GROUP BY
-        c.competency_id,
-        c.competency_name,
-        c.proficiency_level_name,
-        ec.status,
-        ec.progress
-        """), {"eid": employee_id}).fetchall()
-
-        return [
-            {
-                "competency_id": r._mapping["competency_id"],
-                "competency_name": r._mapping["competency_name"],
-                "proficiency_level_name": r._mapping["proficiency_level_name"],
-                "status": r._mapping["status"],
-                "progress": r._mapping.get("progress", 0),
-            }
-            for r in rows
-        ]
 
-    finally:
-        session.close()
+@app.get("/learning-roadmap")
+async def learning_roadmap(
+    employee_id: int = Depends(get_current_employee),
+    session: AsyncSession = Depends(get_db),
+):
+    records = await next_competencies(session, employee_id, limit=5)
 
+    return [
+        {
+            "competency_id": r.competency_id,
+            "competency_name": r.competency_name,
+            "proficiency_level_name": r.proficiency_level_name,
+        }
+        for r in records
+    ]
 
-@app.get("/learning-roadmap")
-def learning_roadmap(employee_id: int = Depends(get_current_employee)):
-    session = SessionLocal()
 
-    try:
-        rows = session.execute(text("""
-            SELECT DISTINCT ON (c.competency_id)
-                   c.competency_id,
-                   c.competency_name,
-                   c.proficiency_level_name
-            FROM competency_catalog c
-            LEFT JOIN employee_competency ec
-              ON ec.competency_id = c.competency_id
-              AND ec.employee_id = :eid
-            WHERE (
-                ec.status IS NULL
-                OR LOWER(ec.status) != 'completed'
-            )
-            AND (
-                c.pre_requisite_id IS NULL
-                OR c.pre_requisite_id IN (
-                    SELECT competency_id
-                    FROM employee_competency
-                    WHERE employee_id = :eid
-                      AND LOWER(status) = 'completed'
-                )
-            )
-            ORDER BY c.competency_id
-            LIMIT 5
-        """), {"eid": employee_id}).fetchall()
-
-        return [
-            {
-                "competency_id": r._mapping["competency_id"],
-                "competency_name": r._mapping["competency_name"],
-                "proficiency_level_name": r._mapping["proficiency_level_name"],
-            }
-            for r in rows
+async def advisor_lookup(session, question: str):
+    """
+    Returns (direct_answer, context). A direct answer comes straight from
+    the catalog without calling the LLM; otherwise context holds the rows
+    to answer from with RAG.
+    """
+
+    # Step 1: roadmap questions, answered from the catalog snapshot
+    with stage("roadmap"):
+        roadmap_answer = await build_learning_sequence(question)
+
+    if roadmap_answer:
+        ADVISOR_BRANCH.labels("roadmap").inc()
+        return roadmap_answer, []
+
+    # Step 2: hybrid lexical + vector retrieval in one round trip
+    context = await retrieve_hybrid(session, question)
+
+    matches = [r for r in context if r.name_match]
+
+    if matches:
+        ADVISOR_BRANCH.labels("name_match").inc()
+        results = [
+            f"{r.competency_id} "
+            f"{r.competency_name} "
+            f"(Level: {r.proficiency_level_name})"
+            for r in matches
         ]
 
-    finally:
-        session.close()
+        return (
+            "Matching competencies:\n" +
+            "\n".join(results)
+        ), []
 
+    ADVISOR_BRANCH.labels("rag" if context else "no_match").inc()
 
-@app.get("/advisor")
-def advisor(question: str, employee_id: int = Depends(get_current_employee)):
+    return None, context
 
-    # Step 1: roadmap questions
-    roadmap_answer = build_learning_sequence(question)
-    if roadmap_answer:
-        return {"answer": roadmap_answer}
 
-    session = SessionLocal()
+NO_MATCH_ANSWER = "No matching competency found in database."
 
-    try:
-        # Step 2: direct DB search
-        rows = session.execute(text("""
-            SELECT DISTINCT competency_name,
-                            competency_id,
-                            proficiency_level_name
-            FROM competency_catalog
-            WHERE competency_name ILIKE '%' || :q || '%'
-            LIMIT 5
-        """), {"q": question}).fetchall()
-
-        if rows:
-            results = [
-                f"{r._mapping['competency_id']} "
-                f"{r._mapping['competency_name']} "
-                f"(Level: {r._mapping['proficiency_level_name']})"
-                for r in rows
-            ]
-
-            return {
-                "answer": "Matching competencies:\n" +
-                          "\n".join(results)
-            }
 
-    finally:
-        session.close()
+@app.get("/advisor")
+async def advisor(
+    question: str,
+    employee_id: int = Depends(get_current_employee),
+    session: AsyncSession = Depends(get_db),
+):
 
-    # Step 3: fallback to RAG
-    context = retrieve_context(question)
+    direct_answer, context = await advisor_lookup(session, question)
+    # Release the connection before generation, which can take minutes.
+    await session.close()
 
+    if direct_answer:
+        return {"answer": direct_answer, "cached": False}
+
+    # Step 3: answer from the retrieved context with RAG
     if context:
         comp = context[0]
-        answer = generate_answer(question, context)
-        acc = evaluate_answer(
-            answer,
-            comp.competency_name,
-            comp.proficiency_level_name
-    )
+        answer, cached = await generate_answer_cached(question, context)
+        with stage("score"):
+            acc = evaluate_answer(
+                answer,
+                comp.competency_name,
+                comp.proficiency_level_name
+            )
         return {
          "answer": answer,
-        "answer_accuracy": acc
+        "answer_accuracy": acc,
+        "cached": cached
         }
 
     return {
-    "answer": "No matching competency found in database.",
+    "answer": NO_MATCH_ANSWER,
     "retrieval_accuracy": 0,
-    "answer_accuracy": 0
+    "answer_accuracy": 0,
+    "cached": False
     }
 
 
+@app.get("/advisor/stream")
+async def advisor_stream(
+    question: str,
+    employee_id: int = Depends(get_current_employee),
+    session: AsyncSession = Depends(get_db),
+):
+    """
+    Streaming /advisor. Catalog answers arrive as a single "token" event;
+    RAG answers are relayed token by token, with accuracy and sources in
+    the final "done" event.
+    """
+
+    # Retrieval uses the request session, so run it before the response
+    # starts streaming, then release the connection: the dependency only
+    # closes the session after the last token is sent.
+    direct_answer, context = await advisor_lookup(session, question)
+    await session.close()
+
+    async def events():
+        if direct_answer:
+            yield sse("token", {"text": direct_answer})
+            yield sse("done", {"cached": False})
+            return
+
+        if not context:
+            yield sse("token", {"text": NO_MATCH_ANSWER})
+            yield sse("done", {
+                "retrieval_accuracy": 0,
+                "answer_accuracy": 0,
+                "cached": False
+            })
+            return
+
+        parts = []
+        cached = False
+
+        async for token, cached in stream_answer_cached(question, context):
+            parts.append(token)
+            yield sse("token", {"text": token})
 
-def build_learning_sequence(question: str):
-    session = SessionLocal()
+        comp = context[0]
+        yield sse("done", {
+            "answer_accuracy": evaluate_answer(
+                "".join(parts),
+                comp.competency_name,
+                comp.proficiency_level_name
+            ),
+            "sources": format_sources(context),
+            "cached": cached
+        })
+
+    return sse_response(events())
 
-    try:
-        comp_match = re.search(
-            r'complete\s+(.+?)\s*\(Level',
-            question,
-            re.I,
-        )
 
-        level_match = re.search(
-            r'Level:\s*(E\d+)',
-            question,
-            re.I,
-        )
 
-        if not comp_match or not level_match:
-            return None
+async def build_learning_sequence(question: str):
+    comp_match = re.search(
+        r'complete\s+(.+?)\s*\(Level',
+        question,
+        re.I,
+    )
 
-        competency = comp_match.group(1).strip()
-        target_level = level_match.group(1).upper()
+    level_match = re.search(
+        r'Level:\s*(E\d+)',
+        question,
+        re.I,
+    )
 
-        rows = session.execute(text("""
-            SELECT DISTINCT proficiency_level_name
-            FROM competency_catalog
-            WHERE LOWER(competency_name) = LOWER(:name)
-        """), {"name": competency}).fetchall()
+    if not comp_match or not level_match:
+        return None
 
-        if not rows:
-            return f"No competency named '{competency}' found."
+    competency = comp_match.group(1).strip()
+    target_level = level_match.group(1).upper()
 
-        levels = sorted(
-            {r._mapping["proficiency_level_name"] for r in rows},
-            key=lambda x: int(x[1:])
-        )
+    levels = (await catalog_store.current()).levels(competency)
 
-        sequence = []
-        for lvl in levels:
-            sequence.append(lvl)
-            if lvl == target_level:
-                break
+    if not levels:
+        return f"No competency named '{competency}' found."
 
-        roadmap_lines = [
-            f"{competency} (Level: {lvl})"
-            for lvl in sequence
-        ]
+    sequence = []
+    for lvl in levels:
+        sequence.append(lvl)
+        if lvl == target_level:
+            break
 
-        return (
-            f"Learning roadmap for {competency}:\n\n"
-            f"{' → '.join(sequence)}\n\n"
-            f"To reach Level {target_level}, complete:\n"
-            + "\n".join(roadmap_lines)
-        )
+    roadmap_lines = [
+        f"{competency} (Level: {lvl})"
+        for lvl in sequence
+    ]
 
-    finally:
-        session.close()
+    return (
+        f"Learning roadmap for {competency}:\n\n"
+        f"{' → '.join(sequence)}\n\n"
+        f"To reach Level {target_level}, complete:\n"
+        + "\n".join(roadmap_lines)
+    )
 
-def build_learning_sequence_from_name(
+async def build_learning_sequence_from_name(
     competency,
     target_level,
     employee_id,
 ):
-    session = SessionLocal()
+    levels = (await catalog_store.current()).levels(competency)
 
-    try:
-        rows = session.execute(text("""
-            SELECT DISTINCT proficiency_level_name
-            FROM competency_catalog
-            WHERE LOWER(competency_name) = LOWER(:name)
-        """), {"name": competency}).fetchall()
-
-        if not rows:
-            return None
-
-        levels = sorted(
-            {r._mapping["proficiency_level_name"] for r in rows},
-            key=lambda x: int(x[1:])
-        )
+    if not levels:
+        return None
 
-        sequence = []
-        for lvl in levels:
-            sequence.append(lvl)
-            if lvl == target_level:
-                break
+    sequence = []
+    for lvl in levels:
+        sequence.append(lvl)
+        if lvl == target_level:
+            break
 
-        roadmap_lines = [
-            f"{competency} (Level: {lvl})"
-            for lvl in sequence
-        ]
+    roadmap_lines = [
+        f"{competency} (Level: {lvl})"
+        for lvl in sequence
+    ]
 
-        details = ",\n".join(roadmap_lines)
-
-        answer = (
-            f"Learning roadmap for {competency}:\n\n"
-            f"{' → '.join(sequence)}\n\n"
-            f"To reach Level {target_level}, complete:\n\n"
-            f"{details}"
-        )
+    details = ",\n".join(roadmap_lines)
 
-        return answer
+    answer = (
+        f"Learning roadmap for {competency}:\n\n"
+        f"{' → '.join(sequence)}\n\n"
+        f"To reach Level {target_level}, complete:\n\n"
+        f"{details}"
+    )
 
-    finally:
-        session.close()
+    return answer
 
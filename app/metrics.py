@@ -0,0 +1,138 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import GaugeMetricFamily
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_seconds",
+    "Time spent in each stage of a request",
+    ["endpoint", "stage", "model"],
+    buckets=(
+        0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+        0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60,
+    ),
+)
+
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+PROMPT_TOKENS = Histogram(
+    "rag_prompt_tokens",
+    "Estimated tokens in each prompt sent for generation",
+    ["model"],
+    buckets=TOKEN_BUCKETS,
+)
+
+PROMPT_EVAL_TOKENS = Histogram(
+    "ollama_prompt_eval_tokens",
+    "Prompt tokens Ollama actually evaluated (prefix cache hits excluded)",
+    ["model"],
+    buckets=TOKEN_BUCKETS,
+)
+
+ADVISOR_BRANCH = Counter(
+    "advisor_answers_total",
+    "Which /advisor branch produced the answer",
+    ["branch"],
+)
+
+
+class RequestTimings:
+    """
+    Stage durations for the current request, summed per stage, in the
+    order the stages first ran. scope is the request's ASGI scope.
+    """
+
+    __slots__ = ("scope", "stages", "notes")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.stages = {}
+        self.notes = {}
+
+    @property
+    def endpoint(self) -> str:
+        # The matched route's template, never the raw path: each distinct
+        # path (e.g. from a scanner) would otherwise add new metric series.
+        route = self.scope.get("route")
+        return getattr(route, "path", "unmatched")
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        return ", ".join(
+            [
+                f"{name};dur={seconds * 1000:.1f}"
+                for name, seconds in self.stages.items()
+            ]
+            + [f"{name};desc={value}" for name, value in self.notes.items()]
+        )
+
+
+_timings = ContextVar("request_timings", default=None)
+
+
+def start_request(scope) -> RequestTimings:
+    timings = RequestTimings(scope)
+    _timings.set(timings)
+    return timings
+
+
+@contextmanager
+def stage(name: str, model: str = ""):
+    """
+    Time a block as one stage of the current request: it is observed in
+    the rag_stage_seconds histogram and added to the Server-Timing header.
+    """
+
+    started = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        timings = _timings.get()
+
+        STAGE_SECONDS.labels(
+            timings.endpoint if timings else "",
+            name,
+            model,
+        ).observe(elapsed)
+
+        if timings is not None:
+            timings.add(name, elapsed)
+
+
+def note(name: str, value):
+    """
+    Attach a value (e.g. a token count) to the current request's
+    Server-Timing header.
+    """
+
+    timings = _timings.get()
+
+    if timings is not None:
+        timings.notes[name] = value
+
+
+class StatsCollector:
+    """
+    Exposes the existing stats() dicts (pools, caches) as gauges named
+    <source>_<key>, read at scrape time.
+    """
+
+    def __init__(self, sources: dict):
+        self.sources = sources
+
+    def describe(self):
+        # Without this, registering would call collect() at import time.
+        return []
+
+    def collect(self):
+        for source, stats in self.sources.items():
+            for key, value in stats().items():
+                gauge = GaugeMetricFamily(f"{source}_{key}", f"{source} {key}")
+                gauge.add_metric([], value)
+                yield gauge
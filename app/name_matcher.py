@@ -0,0 +1,115 @@
+import difflib
+import os
+
+from app.embedding_cache import normalize
+
+# Similarity needed for the typo-tolerant fallback; 0 disables it.
+NAME_MATCH_FUZZY_CUTOFF = float(os.getenv("NAME_MATCH_FUZZY_CUTOFF", "0.85"))
+
+
+class NameMatcher:
+    """
+    Aho-Corasick automaton over normalized competency names. find() scans
+    a question once and returns the longest name it contains (earliest
+    on ties), so detection costs O(len(question)) however large the
+    catalog is.
+    """
+
+    def __init__(self, names):
+        # normalized pattern -> caller's name
+        self.names = {}
+        for name in names:
+            self.names.setdefault(normalize(name), name)
+
+        self.names.pop("", None)
+
+        self._goto = [{}]
+        self._fail = [0]
+        # Longest pattern ending at each node, including via fail links.
+        self._match = [None]
+
+        for pattern in self.names:
+            node = 0
+            for ch in pattern:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._match.append(None)
+                node = nxt
+            self._match[node] = pattern
+
+        self._build_fail_links()
+
+        self._by_words = {}
+        for pattern in self.names:
+            self._by_words.setdefault(len(pattern.split()), []).append(pattern)
+
+    def _build_fail_links(self):
+        queue = list(self._goto[0].values())
+
+        for node in queue:
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+
+                target = self._goto[f].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+
+                if self._match[child] is None:
+                    self._match[child] = self._match[self._fail[child]]
+
+    def find(self, text: str, fuzzy: bool = True):
+        best = None
+        best_start = 0
+        node = 0
+        text = normalize(text)
+
+        for i, ch in enumerate(text):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+
+            pattern = self._match[node]
+            if pattern is None:
+                continue
+
+            start = i + 1 - len(pattern)
+            if best is None or len(pattern) > len(best) or (
+                len(pattern) == len(best) and start < best_start
+            ):
+                best, best_start = pattern, start
+
+        if best is None and fuzzy and NAME_MATCH_FUZZY_CUTOFF > 0:
+            best = self._fuzzy_find(text)
+
+        return self.names[best] if best is not None else None
+
+    def _fuzzy_find(self, text: str):
+        """
+        Compare each run of words in the question against names with the
+        same word count; the closest one above the cutoff wins.
+        """
+
+        words = text.split()
+        best, best_score = None, NAME_MATCH_FUZZY_CUTOFF
+
+        for n, patterns in self._by_words.items():
+            for i in range(len(words) - n + 1):
+                window = " ".join(words[i:i + n])
+
+                for pattern in difflib.get_close_matches(
+                    window, patterns, n=1, cutoff=best_score
+                ):
+                    score = difflib.SequenceMatcher(None, window, pattern).ratio()
+                    if best is None or score > best_score or (
+                        score == best_score and len(pattern) > len(best)
+                    ):
+                        best, best_score = pattern, score
+
+        return best
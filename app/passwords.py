@@ -0,0 +1,114 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from functools import lru_cache
+
+MAX_BCRYPT_BYTES = 72
+
+# Changing BCRYPT_ROUNDS makes needs_update() flag every existing hash, so
+# verify_and_update() rehashes it at the user's next login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", "2"))
+# Logins waiting beyond this are rejected instead of queueing forever.
+PASSWORD_MAX_QUEUE = int(os.getenv("PASSWORD_MAX_QUEUE", "256"))
+
+@lru_cache(maxsize=None)
+def pwd_context():
+    # Imported on first use: the API process itself never hashes, only
+    # the password pool's workers do.
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=BCRYPT_ROUNDS,
+        bcrypt__min_rounds=BCRYPT_ROUNDS,
+        bcrypt__max_rounds=BCRYPT_ROUNDS,
+    )
+
+
+class PasswordPoolBusy(Exception):
+    pass
+
+
+def _truncate(password: str) -> bytes:
+    pwd_bytes = password.encode("utf-8")
+    return pwd_bytes[:MAX_BCRYPT_BYTES]
+
+def hash_password(password: str) -> str:
+    return pwd_context().hash(_truncate(password))
+
+def verify_password(password: str, hashed: str) -> bool:
+    return pwd_context().verify(_truncate(password), hashed)
+
+def verify_and_update(password: str, hashed: str):
+    """
+    Returns (valid, new_hash); new_hash is set when the stored hash was
+    made with a different cost factor.
+    """
+
+    return pwd_context().verify_and_update(_truncate(password), hashed)
+
+
+class PasswordPool:
+    """
+    Runs bcrypt in worker processes so it neither holds the API's GIL nor
+    competes with request handling for the event loop. At most
+    PASSWORD_WORKERS hashes run at once; the rest wait in a bounded queue.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.waiting = 0
+        self.running = 0
+        self._executor = None
+        self._slots = None
+
+    async def run(self, fn, *args):
+        if self._executor is None:
+            # spawn: forking a process that already runs the event loop and
+            # its thread pool is not safe.
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            self._slots = asyncio.Semaphore(self.workers)
+
+        if self.waiting >= self.max_queue:
+            raise PasswordPoolBusy()
+
+        self.waiting += 1
+
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.running += 1
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, fn, *args
+            )
+        finally:
+            self.running -= 1
+            self._slots.release()
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "queue_depth": self.waiting,
+            "max_queue": self.max_queue,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_pool = PasswordPool(PASSWORD_WORKERS, PASSWORD_MAX_QUEUE)
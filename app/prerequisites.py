@@ -0,0 +1,62 @@
+import heapq
+
+
+COMPLETED = "COMPLETED"
+
+
+def is_completed(status) -> bool:
+    return (status or "").upper() == COMPLETED
+
+
+class PrerequisiteGraph:
+    """
+    DAG of competency_catalog.pre_requisite_id, built once per catalog
+    snapshot. Nodes in (or depending on) a prerequisite cycle have no
+    topological position; they are listed in `cyclic` and ordered last.
+    """
+
+    __slots__ = ("prerequisites", "dependents", "order", "cyclic")
+
+    def __init__(self, prerequisites: dict):
+        self.prerequisites = prerequisites
+        self.dependents = {}
+
+        indegree = {cid: 0 for cid in prerequisites}
+
+        for cid, pid in prerequisites.items():
+            if pid is not None and pid in prerequisites:
+                self.dependents.setdefault(pid, []).append(cid)
+                indegree[cid] += 1
+
+        # Kahn's algorithm; the heap keeps ties in competency_id order.
+        ready = [cid for cid, n in indegree.items() if n == 0]
+        heapq.heapify(ready)
+        order = []
+
+        while ready:
+            cid = heapq.heappop(ready)
+            order.append(cid)
+
+            for child in self.dependents.get(cid, ()):
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    heapq.heappush(ready, child)
+
+        self.cyclic = sorted(cid for cid, n in indegree.items() if n > 0)
+        self.order = order + self.cyclic
+
+    def can_start(self, competency_id, completed) -> bool:
+        pid = self.prerequisites.get(competency_id)
+        return pid is None or pid in completed
+
+    def unlocked(self, completed):
+        """
+        Competencies not yet completed whose prerequisite is, in
+        topological order.
+        """
+
+        return [
+            cid
+            for cid in self.order
+            if cid not in completed and self.can_start(cid, completed)
+        ]
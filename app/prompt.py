@@ -0,0 +1,107 @@
+import os
+
+from app.catalog import level_number
+from app.metrics import PROMPT_TOKENS, note
+
+# Upper bound on context tokens per prompt, by the estimate below.
+PROMPT_CONTEXT_TOKENS = int(os.getenv("PROMPT_CONTEXT_TOKENS", "1024"))
+
+# Identical for every request and placed first, so Ollama can reuse the
+# KV cache for it instead of re-evaluating it each time.
+PROMPT_PREFIX = (
+    "You are a competency assistant.\n"
+    "Answer ONLY using the provided context.\n"
+    "If information is not present, say:\n"
+    "\"I cannot find this information in the competency database.\"\n"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count (about 4 characters per token for English with
+    BPE tokenizers); good enough for budgeting, no tokenizer needed.
+    """
+
+    return (len(text) + 3) // 4
+
+
+def _clean(value) -> str:
+    return " ".join(str(value or "").split())
+
+
+def context_blocks(context_rows):
+    """
+    One block per competency, in retrieval order. Rows for the same
+    competency at different levels are merged into a single block that
+    lists the levels and each distinct description once.
+    """
+
+    merged = {}
+
+    for r in context_rows:
+        key = _clean(r.competency_name).casefold()
+        entry = merged.get(key)
+
+        if entry is None:
+            entry = merged[key] = {
+                "name": _clean(r.competency_name),
+                "descriptions": [],
+                "category": _clean(r.category),
+                "focus_area": _clean(r.focus_area),
+                "levels": [],
+            }
+
+        description = _clean(r.description)
+        if description and description not in entry["descriptions"]:
+            entry["descriptions"].append(description)
+
+        level = _clean(r.proficiency_level_name)
+        if level and level not in entry["levels"]:
+            entry["levels"].append(level)
+
+    return [
+        f"Competency: {e['name']}\n"
+        f"Description: {' '.join(e['descriptions'])}\n"
+        f"Category: {e['category']}\n"
+        f"Focus Area: {e['focus_area']}\n"
+        f"Proficiency: {', '.join(sorted(e['levels'], key=level_number))}"
+        for e in merged.values()
+    ]
+
+
+def build_context(context_rows, budget: int = PROMPT_CONTEXT_TOKENS) -> str:
+    """
+    Add blocks in retrieval order until the next one would exceed the
+    token budget. The best match is always kept, cut to fit if needed.
+    """
+
+    blocks = []
+    used = 0
+
+    for block in context_blocks(context_rows):
+        tokens = estimate_tokens(block) + 1
+
+        if used + tokens > budget:
+            if not blocks:
+                blocks.append(block[:budget * 4])
+            break
+
+        blocks.append(block)
+        used += tokens
+
+    return "\n\n".join(blocks)
+
+
+def build_prompt(query: str, context_rows, model: str = "") -> str:
+    prompt = (
+        f"{PROMPT_PREFIX}\n"
+        f"Context:\n{build_context(context_rows)}\n\n"
+        f"Question:\n{_clean(query)}\n\n"
+        "Answer clearly and concisely using the context.\n"
+    )
+
+    tokens = estimate_tokens(prompt)
+    PROMPT_TOKENS.labels(model).observe(tokens)
+    note("prompt_tokens", tokens)
+
+    return prompt
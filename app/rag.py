@@ -1,80 +1,449 @@
 from sqlalchemy import text
-from pgvector.sqlalchemy import Vector
-from app.db import SessionLocal
-from app.embedding import get_embedding
-import requests
+from app import db
+from app.embedding import get_embedding, get_embedding_async
+from app.embedding import get_embeddings_cached_async
+from app.embedding import ollama_async_http, EMBED_MODEL, OLLAMA_KEEP_ALIVE
+from app.metrics import note, stage, PROMPT_EVAL_TOKENS
+from app.prompt import build_prompt
+from app.vector_index import catalog_index
+from app.answer_cache import answer_cache, answer_key
+from app.single_flight import SingleFlight
+import asyncio
+import json
 import os
-from app.embedding import get_embedding
-from sqlalchemy import text
-from app.db import SessionLocal
-import ollama
 
 
-OLLAMA_URL = os.getenv("OLLAMA_BASE_URL")
+LLM_MODEL = os.getenv("LLM_MODEL", "llama3.2")
+# Bump whenever build_prompt changes so cached answers are not reused.
+PROMPT_VERSION = "2"
+# "pgvector" ranks in Postgres; "numpy" uses the in-process catalog index.
+# "quantized" prefilters on the binary column, then ranks exactly.
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "pgvector")
+# Hybrid retrieval: rows taken from each ranking, and the RRF constant.
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "50"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Quantized retrieval: rows kept by the Hamming prefilter for re-ranking.
+QUANTIZED_CANDIDATES = int(os.getenv("QUANTIZED_CANDIDATES", "100"))
+# Re-rank the candidates on the full-precision embedding ("full"), or on
+# the halfvec copy ("half": half the bytes read, slightly lower recall).
+QUANTIZED_RERANK = os.getenv("QUANTIZED_RERANK", "full")
+
+
+def rerank_distance(table: str, query: str) -> str:
+    if QUANTIZED_RERANK == "half":
+        return f"{table}.embedding_half <=> {query}::halfvec"
 
-def retrieve_context(query: str, limit: int = 5):
-    session = SessionLocal()
-    query_embedding = get_embedding(query)
+    return f"{table}.embedding <=> {query}"
 
-    results = session.execute(
-        text("""
-        SELECT competency_name,
+# Generations in progress, by cache_key: identical concurrent questions
+# with the same context wait for one answer instead of each asking Ollama.
+answer_flight = SingleFlight()
+
+# The :limit rows nearest :embedding. An HNSW or IVFFlat index only serves
+# an ORDER BY on the distance alone, so the competency_id tie-break is
+# applied outside the LIMIT. `python -m app.ann_index bench` times this
+# exact statement.
+NEAREST_SQL = """
+    SELECT competency_id,
+           competency_name,
+           description,
+           category,
+           focus_area,
+           proficiency_level_name
+    FROM (
+        SELECT competency_id,
+               competency_name,
                description,
                category,
                focus_area,
-               proficiency_level_name
+               proficiency_level_name,
+               embedding <=> :embedding AS distance
         FROM public.competency_catalog
         WHERE embedding IS NOT NULL
         ORDER BY embedding <=> :embedding
         LIMIT :limit
-        """),
-        {"embedding": query_embedding, "limit": limit}
-    ).fetchall()
+    ) nearest
+    ORDER BY distance, competency_id
+"""
 
-    session.close()
-    return results
-
-def generate_answer(query: str, context_rows):
-    context_text = "\n\n".join([
-        f"""
-        Competency: {r.competency_name}
-        Description: {r.description}
-        Category: {r.category}
-        Focus Area: {r.focus_area}
-        Proficiency: {r.proficiency_level_name}
-        """
-        for r in context_rows
-    ])
+async def retrieve_pgvector(query_embedding, limit: int = 5):
+    async with db.AsyncSessionLocal() as session:
+        result = await session.execute(
+            text(NEAREST_SQL),
+            {"embedding": query_embedding, "limit": limit}
+        )
 
-    prompt = f"""
-    You are a competency assistant.
-    Answer ONLY using the provided context.
-    If information is not present, say:
-    "I cannot find this information in the competency database."
+        return result.fetchall()
 
-Context:
-{context_text}
+async def retrieve_quantized(query_embedding, limit: int = 5, candidates=None):
+    """
+    Two-stage search: Hamming distance over the binary-quantized column
+    picks the candidates, exact cosine distance ranks them (see
+    QUANTIZED_RERANK).
+    """
 
-Question:
-{query}
+    async with db.AsyncSessionLocal() as session:
+        result = await session.execute(
+            text(f"""
+            WITH q AS (
+                SELECT CAST(:embedding AS vector) AS v
+            ),
+            candidates AS (
+                SELECT competency_id
+                FROM public.competency_catalog, q
+                WHERE embedding_bit IS NOT NULL
+                ORDER BY embedding_bit <~> binary_quantize(q.v), competency_id
+                LIMIT :candidates
+            )
+            SELECT c.competency_id,
+                   c.competency_name,
+                   c.description,
+                   c.category,
+                   c.focus_area,
+                   c.proficiency_level_name
+            FROM candidates
+            JOIN public.competency_catalog c USING (competency_id), q
+            ORDER BY {rerank_distance("c", "q.v")}, c.competency_id
+            LIMIT :limit
+            """),
+            {
+                "embedding": query_embedding,
+                "candidates": max(candidates or QUANTIZED_CANDIDATES, limit),
+                "limit": limit,
+            }
+        )
 
-Answer clearly and concisely using the context.
-"""
+        return result.fetchall()
+
+async def retrieve_hybrid(session, query: str, limit: int = 5):
+    """
+    Lexical and vector search fused with reciprocal rank fusion in one
+    query. Rows whose name contains the whole question are flagged with
+    name_match and sorted first.
+    """
+
+    with stage("embed", EMBED_MODEL):
+        query_embedding = await get_embedding_async(query)
+
+    with stage("retrieve"):
+        result = await session.execute(
+            text("""
+            WITH query AS (
+                -- OR the question's terms together; plainto_tsquery ANDs them.
+                SELECT replace(
+                           plainto_tsquery('english', :q)::text, '&', '|'
+                       )::tsquery AS tsq
+            ),
+            vector AS (
+                -- Distance-only ORDER BY so the ANN index can serve it;
+                -- ties are broken, and ranks assigned, by the window.
+                SELECT competency_id,
+                       row_number() OVER (ORDER BY distance, competency_id) AS rank
+                FROM (
+                    SELECT competency_id,
+                           embedding <=> :embedding AS distance
+                    FROM public.competency_catalog
+                    WHERE embedding IS NOT NULL
+                    ORDER BY embedding <=> :embedding
+                    LIMIT :candidates
+                ) v
+            ),
+            lexical AS (
+                -- Rank explicitly: a subquery's ORDER BY is not
+                -- guaranteed to survive into row_number() OVER ().
+                SELECT competency_id,
+                       row_number() OVER (
+                           ORDER BY name_hit DESC, text_rank DESC, competency_id
+                       ) AS rank
+                FROM (
+                    SELECT c.competency_id,
+                           c.competency_name ILIKE '%' || :q || '%' AS name_hit,
+                           ts_rank_cd(c.search_tsv, query.tsq) AS text_rank
+                    FROM public.competency_catalog c, query
+                    WHERE c.search_tsv @@ query.tsq
+                       OR c.competency_name ILIKE '%' || :q || '%'
+                    ORDER BY name_hit DESC, text_rank DESC, c.competency_id
+                    LIMIT :candidates
+                ) l
+            ),
+            fused AS (
+                SELECT competency_id,
+                       sum(1.0 / (:rrf_k + rank)) AS score
+                FROM (
+                    SELECT * FROM vector
+                    UNION ALL
+                    SELECT * FROM lexical
+                ) ranks
+                GROUP BY competency_id
+            )
+            SELECT c.competency_id,
+                   c.competency_name,
+                   c.description,
+                   c.category,
+                   c.focus_area,
+                   c.proficiency_level_name,
+                   c.competency_name ILIKE '%' || :q || '%' AS name_match
+            FROM fused f
+            JOIN public.competency_catalog c USING (competency_id)
+            ORDER BY name_match DESC, f.score DESC, c.competency_id
+            LIMIT :limit
+            """),
+            {
+                "q": query,
+                "embedding": query_embedding,
+                "candidates": HYBRID_CANDIDATES,
+                "rrf_k": RRF_K,
+                "limit": limit,
+            }
+        )
+
+    return result.fetchall()
+
+async def retrieve_numpy(query_embedding, limit: int = 5):
+    # The periodic refresh talks to the sync engine; keep it off the loop.
+    if catalog_index.refresh_due():
+        await asyncio.to_thread(catalog_index.maybe_refresh)
+
+    return catalog_index.search(query_embedding, limit)
+
+async def retrieve_context(query: str, limit: int = 5):
+    with stage("embed", EMBED_MODEL):
+        query_embedding = await get_embedding_async(query)
+
+    with stage("retrieve"):
+        if RETRIEVAL_BACKEND == "numpy":
+            return await retrieve_numpy(query_embedding, limit)
+
+        if RETRIEVAL_BACKEND == "quantized":
+            return await retrieve_quantized(query_embedding, limit)
+
+        return await retrieve_pgvector(query_embedding, limit)
+
+def vector_literal(embedding) -> str:
+    return "[" + ",".join(map(repr, map(float, embedding))) + "]"
+
+async def retrieve_pgvector_batch(query_embeddings, limit: int = 5):
+    """
+    Top-k rows for every query embedding in one statement. Returns one
+    list of rows per embedding, in input order.
+    """
+
+    async with db.AsyncSessionLocal() as session:
+        result = await session.execute(
+            text("""
+            SELECT q.ord,
+                   c.competency_id,
+                   c.competency_name,
+                   c.description,
+                   c.category,
+                   c.focus_area,
+                   c.proficiency_level_name
+            FROM unnest(
+                CAST(CAST(:embeddings AS text[]) AS vector[])
+            ) WITH ORDINALITY AS q(embedding, ord)
+            CROSS JOIN LATERAL (
+                SELECT competency_id,
+                       competency_name,
+                       description,
+                       category,
+                       focus_area,
+                       proficiency_level_name,
+                       embedding <=> q.embedding AS distance
+                FROM public.competency_catalog
+                WHERE embedding IS NOT NULL
+                -- Distance only, so the ANN index can serve it; ties are
+                -- broken by the outer ORDER BY.
+                ORDER BY embedding <=> q.embedding
+                LIMIT :limit
+            ) c
+            ORDER BY q.ord, c.distance, c.competency_id
+            """),
+            {
+                "embeddings": [vector_literal(e) for e in query_embeddings],
+                "limit": limit,
+            }
+        )
+
+        contexts = [[] for _ in query_embeddings]
+
+        for row in result.fetchall():
+            contexts[row.ord - 1].append(row)
+
+        return contexts
+
+async def retrieve_quantized_batch(
+    query_embeddings, limit: int = 5, candidates=None
+):
+    """
+    retrieve_quantized for every query embedding in one statement.
+    Returns one list of rows per embedding, in input order.
+    """
+
+    async with db.AsyncSessionLocal() as session:
+        result = await session.execute(
+            text(f"""
+            SELECT q.ord,
+                   c.competency_id,
+                   c.competency_name,
+                   c.description,
+                   c.category,
+                   c.focus_area,
+                   c.proficiency_level_name
+            FROM unnest(
+                CAST(CAST(:embeddings AS text[]) AS vector[])
+            ) WITH ORDINALITY AS q(embedding, ord)
+            CROSS JOIN LATERAL (
+                SELECT cat.competency_id,
+                       cat.competency_name,
+                       cat.description,
+                       cat.category,
+                       cat.focus_area,
+                       cat.proficiency_level_name,
+                       {rerank_distance("cat", "q.embedding")} AS distance
+                FROM (
+                    SELECT competency_id
+                    FROM public.competency_catalog
+                    WHERE embedding_bit IS NOT NULL
+                    ORDER BY embedding_bit <~> binary_quantize(q.embedding),
+                             competency_id
+                    LIMIT :candidates
+                ) candidates
+                JOIN public.competency_catalog cat USING (competency_id)
+                ORDER BY distance, cat.competency_id
+                LIMIT :limit
+            ) c
+            ORDER BY q.ord, c.distance, c.competency_id
+            """),
+            {
+                "embeddings": [vector_literal(e) for e in query_embeddings],
+                "candidates": max(candidates or QUANTIZED_CANDIDATES, limit),
+                "limit": limit,
+            }
+        )
+
+        contexts = [[] for _ in query_embeddings]
+
+        for row in result.fetchall():
+            contexts[row.ord - 1].append(row)
+
+        return contexts
+
+async def retrieve_context_batch(queries, limit: int = 5):
+    """
+    retrieve_context for many questions: one batched embedding pass and
+    one retrieval query.
+    """
+
+    queries = list(queries)
+
+    if not queries:
+        return []
 
-    response = requests.post(
-        f"{OLLAMA_URL}/api/generate",
+    with stage("embed", EMBED_MODEL):
+        query_embeddings = await get_embeddings_cached_async(queries)
+
+    with stage("retrieve"):
+        if RETRIEVAL_BACKEND == "numpy":
+            if catalog_index.refresh_due():
+                await asyncio.to_thread(catalog_index.maybe_refresh)
+
+            return [catalog_index.search(e, limit) for e in query_embeddings]
+
+        if RETRIEVAL_BACKEND == "quantized":
+            return await retrieve_quantized_batch(query_embeddings, limit)
+
+        return await retrieve_pgvector_batch(query_embeddings, limit)
+
+async def generate_answer(query: str, context_rows):
+    response = await ollama_async_http.post(
+        "/api/generate",
         json={
-            "model": "llama3.2",
-            "prompt": prompt,
+            "model": LLM_MODEL,
+            "keep_alive": OLLAMA_KEEP_ALIVE,
+            "prompt": build_prompt(query, context_rows, LLM_MODEL),
             "stream": False
         }
     )
 
     response.raise_for_status()
-    return response.json()["response"]
+    body = response.json()
+
+    if "prompt_eval_count" in body:
+        PROMPT_EVAL_TOKENS.labels(LLM_MODEL).observe(body["prompt_eval_count"])
+
+    return body["response"]
+
+def cache_key(query: str, context_rows):
+    return answer_key(query, context_rows, LLM_MODEL, PROMPT_VERSION)
+
+async def generate_answer_cached(query: str, context_rows):
+    """
+    generate_answer behind the answer cache and answer_flight. Returns
+    (answer, cached); cached is also True for an answer shared from an
+    identical request that was already generating it.
+    """
+
+    key = cache_key(query, context_rows)
+    answer = answer_cache.get(key)
+
+    if answer is not None:
+        return answer, True
+
+    async def generate():
+        with stage("generate", LLM_MODEL):
+            answer = await generate_answer(query, context_rows)
+        answer_cache.put(key, answer)
+        return answer
+
+    running = answer_flight.running(key)
+
+    if running is not None:
+        with stage("wait"):
+            answer = await asyncio.shield(running)
+        note("coalesced", 1)
+        return answer, True
+
+    # shield: if this request is cancelled, the others still get the answer.
+    return await asyncio.shield(answer_flight.start(key, generate)), False
+
+async def stream_answer(query: str, context_rows):
+    """
+    Yield answer text as Ollama generates it instead of waiting for the
+    whole response.
+    """
+
+    async with ollama_async_http.stream(
+        "POST",
+        "/api/generate",
+        json={
+            "model": LLM_MODEL,
+            "keep_alive": OLLAMA_KEEP_ALIVE,
+            "prompt": build_prompt(query, context_rows, LLM_MODEL),
+            "stream": True
+        },
+    ) as response:
+        response.raise_for_status()
+
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+
+            chunk = json.loads(line)
+
+            if chunk.get("response"):
+                yield chunk["response"]
+
+            if chunk.get("done"):
+                if "prompt_eval_count" in chunk:
+                    PROMPT_EVAL_TOKENS.labels(LLM_MODEL).observe(
+                        chunk["prompt_eval_count"]
+                    )
+                break
 
 def ask_question(question: str):
-    session = SessionLocal()
+    import ollama
+
+    session = db.SessionLocal()
 
     emb = get_embedding(question)
 
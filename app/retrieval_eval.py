@@ -0,0 +1,232 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import numpy as np
+
+from sqlalchemy import text
+
+from app.db import AsyncSessionLocal, async_engine
+from app.embedding import get_embeddings_cached_async
+from app.rag import retrieve_pgvector, retrieve_hybrid, retrieve_quantized
+from app.vector_index import catalog_index
+
+EVAL_CONCURRENCY = int(os.getenv("EVAL_CONCURRENCY", "8"))
+
+BACKENDS = ("pgvector", "numpy", "hybrid", "quantized")
+
+
+def load_golden(path, require_expected=True):
+    """
+    Read a JSONL golden set: one {"question": ..., "expected": [ids]}
+    object per line ("expected_competency_ids" is accepted too). With
+    require_expected=False, questions without expected ids are kept.
+    """
+
+    golden = []
+
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+
+            item = json.loads(line)
+            expected = item.get("expected", item.get("expected_competency_ids"))
+
+            if item.get("question") and (expected or not require_expected):
+                golden.append((item["question"], set(expected or ())))
+
+    return golden
+
+
+async def retrieve_exact(embedding, limit):
+    """
+    Full-precision top-k by a sequential scan, bypassing the HNSW index:
+    the baseline that --vs-exact scores the other backends against.
+    """
+
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            await session.execute(text("SET LOCAL enable_indexscan = off"))
+            result = await session.execute(
+                text("""
+                SELECT competency_id
+                FROM public.competency_catalog
+                WHERE embedding IS NOT NULL
+                ORDER BY embedding <=> CAST(:embedding AS vector), competency_id
+                LIMIT :limit
+                """),
+                {"embedding": embedding, "limit": limit}
+            )
+
+            return [r.competency_id for r in result]
+
+
+async def retrieve_ids(backend, question, embedding, limit, candidates=None):
+    if backend == "pgvector":
+        rows = await retrieve_pgvector(embedding, limit)
+    elif backend == "numpy":
+        rows = catalog_index.search(embedding, limit)
+    elif backend == "quantized":
+        rows = await retrieve_quantized(embedding, limit, candidates)
+    else:
+        async with AsyncSessionLocal() as session:
+            rows = await retrieve_hybrid(session, question, limit)
+
+    return [r.competency_id for r in rows]
+
+
+def score(ranked, expected, ks):
+    """
+    Recall@k and reciprocal rank of one ranking. expected is either a set
+    of relevant ids, or the exact search's ranked list: then recall@k is
+    the overlap with its top k, and the rank is that of its top hit.
+    """
+
+    if isinstance(expected, list):
+        recall = {
+            k: len(set(expected[:k]).intersection(ranked[:k])) / len(expected[:k])
+            for k in ks
+        }
+        expected = set(expected[:1])
+    else:
+        recall = {
+            k: len(expected.intersection(ranked[:k])) / len(expected)
+            for k in ks
+        }
+
+    reciprocal_rank = next(
+        (1 / rank for rank, cid in enumerate(ranked, 1) if cid in expected),
+        0.0,
+    )
+
+    return recall, reciprocal_rank
+
+
+async def evaluate_backend(
+    backend, golden, embeddings, ks, concurrency, candidates=None
+):
+    slots = asyncio.Semaphore(concurrency)
+    limit = max(ks)
+
+    async def run(question, expected, embedding):
+        async with slots:
+            started = time.perf_counter()
+            ranked = await retrieve_ids(
+                backend, question, embedding, limit, candidates
+            )
+            elapsed = time.perf_counter() - started
+
+        return score(ranked, expected, ks), elapsed
+
+    results = await asyncio.gather(*[
+        run(question, expected, embedding)
+        for (question, expected), embedding in zip(golden, embeddings)
+    ])
+
+    latency_ms = np.array([elapsed for _, elapsed in results]) * 1000
+
+    return {
+        "backend": f"{backend}@{candidates}" if candidates else backend,
+        "questions": len(results),
+        "recall": {
+            k: float(np.mean([recall[k] for (recall, _), _ in results]))
+            for k in ks
+        },
+        "mrr": float(np.mean([rr for (_, rr), _ in results])),
+        "p50_ms": float(np.percentile(latency_ms, 50)),
+        "p95_ms": float(np.percentile(latency_ms, 95)),
+        "p99_ms": float(np.percentile(latency_ms, 99)),
+    }
+
+
+async def evaluate(
+    golden, ks, backends, concurrency=EVAL_CONCURRENCY,
+    candidates=(), vs_exact=False,
+):
+    """
+    Recall@k, MRR and latency percentiles for each backend over the
+    golden set. Embeddings are computed once up front, so latency covers
+    retrieval only. With vs_exact, the expected ids are replaced by the
+    exact full-precision top-k; candidates sweeps the quantized prefilter
+    size.
+    """
+
+    embeddings = await get_embeddings_cached_async(q for q, _ in golden)
+
+    if vs_exact:
+        exact = await asyncio.gather(*[
+            retrieve_exact(embedding, max(ks)) for embedding in embeddings
+        ])
+        golden = [(q, ids) for (q, _), ids in zip(golden, exact) if ids]
+        embeddings = [e for e, ids in zip(embeddings, exact) if ids]
+
+    if "numpy" in backends:
+        await asyncio.to_thread(catalog_index.maybe_refresh)
+
+    reports = []
+
+    for backend in backends:
+        sweep = candidates if backend == "quantized" and candidates else [None]
+
+        for n in sweep:
+            reports.append(await evaluate_backend(
+                backend, golden, embeddings, ks, concurrency, n
+            ))
+
+    await async_engine.dispose()
+
+    return reports
+
+
+def print_reports(reports, ks):
+    header = f"{'backend':<16}" + "".join(f"{f'R@{k}':>8}" for k in ks)
+    print(header + f"{'MRR':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+
+    for r in reports:
+        print(
+            f"{r['backend']:<16}"
+            + "".join(f"{r['recall'][k]:>8.3f}" for k in ks)
+            + f"{r['mrr']:>8.3f}{r['p50_ms']:>10.2f}"
+            f"{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure retrieval quality and latency on a golden set."
+    )
+    parser.add_argument("golden", help="JSONL of question -> expected ids")
+    parser.add_argument("-k", type=int, nargs="+", default=[1, 5, 10])
+    parser.add_argument(
+        "--backend", nargs="+", choices=BACKENDS, default=["pgvector"]
+    )
+    parser.add_argument("--concurrency", type=int, default=EVAL_CONCURRENCY)
+    parser.add_argument(
+        "--candidates", type=int, nargs="+", default=[],
+        help="quantized prefilter sizes to sweep (default QUANTIZED_CANDIDATES)",
+    )
+    parser.add_argument(
+        "--vs-exact", action="store_true",
+        help="score against exact full-precision search instead of the "
+             "golden ids (expected ids are then optional)",
+    )
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    golden = load_golden(args.golden, require_expected=not args.vs_exact)
+    ks = sorted(set(args.k))
+
+    reports = asyncio.run(evaluate(
+        golden, ks, args.backend, args.concurrency,
+        args.candidates, args.vs_exact,
+    ))
+
+    print(f"{len(golden)} questions")
+    print_reports(reports, ks)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
@@ -0,0 +1,233 @@
+import os
+
+from sqlalchemy import text
+from app.embedding import EMBED_DIMENSIONS
+
+# Idempotent DDL applied on top of the base competency schema. Append new
+# statements at the end; every statement must be safe to run repeatedly.
+MIGRATIONS = [
+    """
+    ALTER TABLE public.competency_catalog
+        ADD COLUMN IF NOT EXISTS embedding_hash TEXT,
+        ADD COLUMN IF NOT EXISTS embedding_model TEXT
+    """,
+    # Row-level change log so in-process caches of the catalog can pick up
+    # exactly the rows that changed since they last looked.
+    """
+    CREATE TABLE IF NOT EXISTS public.competency_catalog_changes (
+        seq BIGSERIAL PRIMARY KEY,
+        competency_id INT NOT NULL,
+        changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+    """,
+    # seq is taken when a row is written, not when its transaction
+    # commits, so readers can't rely on it alone; they also re-read every
+    # change whose transaction (xid) was still running at their last look.
+    """
+    ALTER TABLE public.competency_catalog_changes
+        ADD COLUMN IF NOT EXISTS xid xid8 NOT NULL DEFAULT pg_current_xact_id()
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS competency_catalog_changes_xid
+    ON public.competency_catalog_changes (xid)
+    """,
+    """
+    CREATE OR REPLACE FUNCTION public.log_competency_catalog_change()
+    RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            INSERT INTO public.competency_catalog_changes(competency_id)
+            VALUES (OLD.competency_id);
+            RETURN OLD;
+        END IF;
+
+        INSERT INTO public.competency_catalog_changes(competency_id)
+        VALUES (NEW.competency_id);
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    DROP TRIGGER IF EXISTS competency_catalog_change_log
+    ON public.competency_catalog
+    """,
+    """
+    CREATE TRIGGER competency_catalog_change_log
+    AFTER INSERT OR UPDATE OR DELETE ON public.competency_catalog
+    FOR EACH ROW EXECUTE FUNCTION public.log_competency_catalog_change()
+    """,
+    # Existing sessions get a fresh expiry instead of being logged out.
+    """
+    ALTER TABLE public.employee_sessions
+        ADD COLUMN IF NOT EXISTS expires_at TIMESTAMPTZ
+        NOT NULL DEFAULT now() + interval '12 hours'
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS employee_sessions_expires_at
+    ON public.employee_sessions (expires_at)
+    """,
+    # Lexical side of hybrid retrieval: full text over name, description
+    # and microskills, trigrams for substring matches on the name.
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    ALTER TABLE public.competency_catalog
+        ADD COLUMN IF NOT EXISTS search_tsv tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(competency_name, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(description, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(microskills, '')), 'C')
+        ) STORED
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS competency_catalog_search_tsv
+    ON public.competency_catalog USING gin (search_tsv)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS competency_catalog_name_trgm
+    ON public.competency_catalog USING gin (competency_name gin_trgm_ops)
+    """,
+]
+
+# halfvec and binary_quantize arrived in pgvector 0.7.
+QUANTIZED_PGVECTOR_VERSION = (0, 7)
+
+# Compact copies of the embedding for two-stage retrieval: a binary
+# Hamming prefilter (96 bytes a row at 768 dims) and a half-precision
+# re-rank. Ingest keeps them in step; existing rows are backfilled.
+# Applied only where pgvector supports them.
+QUANTIZED_MIGRATIONS = [
+    f"""
+    ALTER TABLE public.competency_catalog
+        ADD COLUMN IF NOT EXISTS embedding_half halfvec({EMBED_DIMENSIONS}),
+        ADD COLUMN IF NOT EXISTS embedding_bit bit({EMBED_DIMENSIONS})
+    """,
+    """
+    UPDATE public.competency_catalog
+    SET embedding_half = embedding::halfvec,
+        embedding_bit = binary_quantize(embedding)
+    WHERE embedding IS NOT NULL
+      AND embedding_bit IS NULL
+    """,
+]
+
+CHANGE_LOG_RETENTION = "7 days"
+
+# How long a migration waits for a table lock before giving up. Several
+# statements take ACCESS EXCLUSIVE locks even when there is nothing to
+# change; waiting behind a long reader (e.g. an ingest) would queue every
+# other catalog query behind the migration.
+MIGRATION_LOCK_TIMEOUT = os.getenv("MIGRATION_LOCK_TIMEOUT", "5s")
+
+# Columns the API relies on, checked at startup (the API never migrates).
+REQUIRED_COLUMNS = (
+    ("competency_catalog", "embedding_hash"),
+    ("competency_catalog", "embedding_model"),
+    ("competency_catalog", "search_tsv"),
+    ("competency_catalog_changes", "xid"),
+    ("employee_sessions", "expires_at"),
+)
+QUANTIZED_COLUMNS = (
+    ("competency_catalog", "embedding_half"),
+    ("competency_catalog", "embedding_bit"),
+)
+
+
+def pgvector_version(session):
+    version = session.execute(text(
+        "SELECT extversion FROM pg_extension WHERE extname = 'vector'"
+    )).scalar()
+
+    if not version:
+        return ()
+
+    return tuple(int(part) for part in version.split(".") if part.isdigit())
+
+
+def migrate(session, require_quantized: bool = False):
+    """
+    Apply MIGRATIONS, and QUANTIZED_MIGRATIONS when pgvector is new
+    enough. Returns whether the quantized columns are available; raises
+    if they are required (RETRIEVAL_BACKEND=quantized) but unsupported.
+    """
+
+    # A deploy and an ingest may run this at once; let one apply the DDL.
+    session.execute(text("SELECT pg_advisory_xact_lock(hashtext('app.schema'))"))
+    session.execute(
+        text("SELECT set_config('lock_timeout', :timeout, true)"),
+        {"timeout": MIGRATION_LOCK_TIMEOUT},
+    )
+
+    for statement in MIGRATIONS:
+        session.execute(text(statement))
+
+    version = pgvector_version(session)
+    quantized = version >= QUANTIZED_PGVECTOR_VERSION
+
+    if quantized:
+        for statement in QUANTIZED_MIGRATIONS:
+            session.execute(text(statement))
+
+    session.commit()
+
+    if not quantized:
+        found = ".".join(map(str, version)) or "not installed"
+        message = (
+            f"pgvector {found}: quantized embeddings need "
+            f"{'.'.join(map(str, QUANTIZED_PGVECTOR_VERSION))} or newer"
+        )
+
+        if require_quantized:
+            raise RuntimeError(f"RETRIEVAL_BACKEND=quantized, but {message}")
+
+        print(f"Skipping quantized columns; {message}")
+
+    return quantized
+
+
+def check_schema(session, require_quantized: bool = False):
+    """
+    Fail fast if the migrations have not been applied. Read-only: takes
+    no locks beyond the catalog lookups. Returns whether the quantized
+    columns exist.
+    """
+
+    present = {
+        (r.table_name, r.column_name)
+        for r in session.execute(text("""
+            SELECT table_name, column_name
+            FROM information_schema.columns
+            WHERE table_schema = 'public'
+        """))
+    }
+
+    required = REQUIRED_COLUMNS + (QUANTIZED_COLUMNS if require_quantized else ())
+    missing = [f"{t}.{c}" for t, c in required if (t, c) not in present]
+
+    if missing:
+        # The quantized columns are only created on pgvector 0.7+.
+        raise RuntimeError(
+            f"Database schema is out of date (missing {', '.join(missing)}); "
+            "run `python -m app.schema` before starting the API"
+        )
+
+    return all(column in present for column in QUANTIZED_COLUMNS)
+
+
+def purge_change_log(session):
+    session.execute(text(f"""
+        DELETE FROM public.competency_catalog_changes
+        WHERE changed_at < now() - interval '{CHANGE_LOG_RETENTION}'
+    """))
+
+    session.commit()
+
+
+if __name__ == "__main__":
+    from app.db import SessionLocal
+
+    session = SessionLocal()
+
+    try:
+        migrate(session)
+    finally:
+        session.close()
@@ -0,0 +1,72 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    In-flight deduplication for async calls: while a call for a key is
+    running, identical calls wait on the same task instead of starting
+    their own. Nothing is kept once it finishes, so this never serves a
+    stale result; caching stays the caller's job.
+    """
+
+    def __init__(self):
+        self._running = {}
+        self.started = 0
+        self.joined = 0
+
+    def running(self, key):
+        """
+        The task computing key, or None if no call for it is in flight.
+        """
+
+        task = self._running.get(key)
+
+        if task is not None:
+            self.joined += 1
+
+        return task
+
+    def start(self, key, fn):
+        """
+        Run fn() as a task registered under key. The task is not tied to
+        the caller, so a disconnecting leader does not cancel the work
+        the other callers are waiting for.
+        """
+
+        task = asyncio.ensure_future(fn())
+        self._running[key] = task
+        self.started += 1
+        task.add_done_callback(lambda t: self._finished(key, t))
+
+        return task
+
+    def _finished(self, key, task):
+        if self._running.get(key) is task:
+            del self._running[key]
+
+        # Mark the error as retrieved when every caller has gone away.
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key, fn):
+        """
+        Await fn() once per key across concurrent callers. Returns
+        (result, shared), shared being True for callers that joined a
+        call already in flight.
+        """
+
+        task = self.running(key)
+        shared = task is not None
+
+        if not shared:
+            task = self.start(key, fn)
+
+        # shield: a cancelled caller must not cancel the shared task.
+        return await asyncio.shield(task), shared
+
+    def stats(self):
+        return {
+            "in_flight": len(self._running),
+            "started": self.started,
+            "joined": self.joined,
+        }
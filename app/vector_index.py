@@ -0,0 +1,271 @@
+import argparse
+import asyncio
+import os
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+from sqlalchemy import text
+from app import db
+
+VECTOR_INDEX_REFRESH_SECONDS = float(
+    os.getenv("VECTOR_INDEX_REFRESH_SECONDS", "30")
+)
+
+IndexedRow = namedtuple(
+    "IndexedRow",
+    [
+        "competency_id",
+        "competency_name",
+        "description",
+        "category",
+        "focus_area",
+        "proficiency_level_name",
+    ],
+)
+
+ROW_COLUMNS = """
+    competency_id,
+    competency_name,
+    description,
+    category,
+    focus_area,
+    proficiency_level_name,
+    embedding
+"""
+
+
+def _as_array(value):
+    # pgvector returns Vector objects; older releases returned ndarrays.
+    if hasattr(value, "to_numpy"):
+        value = value.to_numpy()
+
+    return np.asarray(value, dtype=np.float32)
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+class VectorIndex:
+    """
+    All catalog embeddings held as one L2-normalized float32 matrix, so a
+    top-k cosine search is a single matrix-vector product.
+
+    The index state is swapped atomically on refresh; searches never take
+    the lock and always see a consistent (ids, matrix, rows) triple.
+    """
+
+    def __init__(self):
+        self._state = (
+            np.empty(0, dtype=np.int64),
+            np.empty((0, 0), dtype=np.float32),
+            [],
+        )
+        self.seq = 0
+        self.xmin = 0
+        self.loaded = False
+        self.checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._state[0])
+
+    def load(self, session):
+        marks = self._change_marks(session)
+
+        rows = session.execute(text(f"""
+            SELECT {ROW_COLUMNS}
+            FROM public.competency_catalog
+            WHERE embedding IS NOT NULL
+            ORDER BY competency_id
+        """)).fetchall()
+
+        self._state = self._build(rows)
+        self.seq = marks.last or 0
+        self.xmin = marks.xmin
+        self.loaded = True
+        self.checked_at = time.monotonic()
+
+    def refresh(self, session):
+        """
+        Apply only the rows logged in competency_catalog_changes since the
+        last load or refresh. Changes are selected by transaction, from the
+        oldest one still running at the last look, so a transaction that
+        commits after a later seq was read is still picked up.
+        """
+
+        marks = self._change_marks(session)
+
+        self.checked_at = time.monotonic()
+
+        # Entries we never saw were purged; fall back to a full load.
+        if marks.first is not None and marks.first > self.seq + 1 and self.seq:
+            self.load(session)
+            return
+
+        changed = session.execute(text("""
+            SELECT DISTINCT competency_id
+            FROM public.competency_catalog_changes
+            WHERE xid >= CAST(CAST(:xmin AS text) AS xid8)
+        """), {"xmin": str(self.xmin)}).scalars().all()
+
+        if not changed:
+            self.xmin = marks.xmin
+            return
+
+        rows = session.execute(text(f"""
+            SELECT {ROW_COLUMNS}
+            FROM public.competency_catalog
+            WHERE embedding IS NOT NULL
+            AND competency_id = ANY(:ids)
+        """), {"ids": list(changed)}).fetchall()
+
+        ids, matrix, index_rows = self._state
+        keep = ~np.isin(ids, changed)
+        fresh_ids, fresh_matrix, fresh_rows = self._build(rows)
+
+        if not keep.any():
+            matrix = fresh_matrix
+        elif len(fresh_ids):
+            matrix = np.vstack([matrix[keep], fresh_matrix])
+        else:
+            matrix = matrix[keep]
+
+        self._state = (
+            np.concatenate([ids[keep], fresh_ids]),
+            matrix,
+            [r for r, k in zip(index_rows, keep) if k] + fresh_rows,
+        )
+        self.seq = max(self.seq, marks.last or 0)
+        self.xmin = marks.xmin
+
+    def refresh_due(self):
+        return not self.loaded or (
+            time.monotonic() - self.checked_at >= VECTOR_INDEX_REFRESH_SECONDS
+        )
+
+    def maybe_refresh(self):
+        if not self.refresh_due():
+            return
+
+        # Only one caller refreshes; everyone else keeps searching the
+        # current state instead of queueing behind the database.
+        if not self._lock.acquire(blocking=False):
+            if self.loaded:
+                return
+            self._lock.acquire()
+
+        try:
+            session = db.SessionLocal()
+
+            try:
+                if not self.loaded:
+                    self.load(session)
+                else:
+                    self.refresh(session)
+            finally:
+                session.close()
+        finally:
+            self._lock.release()
+
+    def search(self, query_embedding, k: int = 5):
+        ids, matrix, rows = self._state
+
+        if not len(ids):
+            return []
+
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+        scores = matrix @ query
+        k = min(k, len(ids))
+
+        top = np.argpartition(-scores, k - 1)[:k]
+        # argpartition picks arbitrarily among rows tied with the k-th
+        # score; take them all so the id tie-break decides the cut.
+        top = np.flatnonzero(scores >= scores[top].min())
+        # Highest similarity first; ties broken by id like the SQL path.
+        top = top[np.lexsort((ids[top], -scores[top]))][:k]
+
+        return [rows[i] for i in top]
+
+    @staticmethod
+    def _change_marks(session):
+        # xmin: every transaction older than the oldest one still running
+        # has committed (or aborted), so its changes are visible from here on.
+        return session.execute(text("""
+            SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint AS xmin,
+                   min(seq) AS first,
+                   max(seq) AS last
+            FROM public.competency_catalog_changes
+        """)).fetchone()
+
+    @staticmethod
+    def _build(rows):
+        if not rows:
+            return (
+                np.empty(0, dtype=np.int64),
+                np.empty((0, 0), dtype=np.float32),
+                [],
+            )
+
+        ids = np.array([r.competency_id for r in rows], dtype=np.int64)
+        matrix = _normalize(
+            np.vstack([_as_array(r.embedding) for r in rows])
+        )
+        index_rows = [
+            IndexedRow(*(getattr(r, f) for f in IndexedRow._fields))
+            for r in rows
+        ]
+
+        return ids, matrix, index_rows
+
+
+catalog_index = VectorIndex()
+
+
+def search_catalog(query_embedding, k: int = 5):
+    catalog_index.maybe_refresh()
+    return catalog_index.search(query_embedding, k)
+
+
+async def verify(questions, k: int = 5):
+    """
+    Run each question through both retrieval backends and report any
+    question whose top-k competency ids differ.
+    """
+
+    from app.embedding import get_embedding_async
+    from app.rag import retrieve_pgvector
+
+    mismatches = 0
+
+    for question in questions:
+        embedding = await get_embedding_async(question)
+        expected = [
+            r.competency_id for r in await retrieve_pgvector(embedding, k)
+        ]
+        actual = [r.competency_id for r in search_catalog(embedding, k)]
+
+        if expected != actual:
+            mismatches += 1
+            print(f"MISMATCH {question!r}\n  pgvector: {expected}\n  numpy:    {actual}")
+
+    print(f"{len(questions) - mismatches}/{len(questions)} questions identical")
+
+    return mismatches == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check the numpy index returns the same top-k as pgvector."
+    )
+    parser.add_argument("questions", nargs="+")
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    identical = asyncio.run(verify(args.questions, args.k))
+
+    raise SystemExit(0 if identical else 1)
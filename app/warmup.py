@@ -0,0 +1,106 @@
+import asyncio
+import os
+import time
+
+from app.embedding import ollama_async_http, EMBED_MODEL, OLLAMA_KEEP_ALIVE
+from app.prompt import PROMPT_PREFIX
+from app.rag import LLM_MODEL
+
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "true").lower() == "true"
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "10"))
+
+
+class WarmState:
+    """
+    What /ready reports: whether startup finished and which Ollama
+    models have been loaded.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.models = {
+            "embed": {"model": EMBED_MODEL, "warm": False, "seconds": None, "error": None},
+            "llm": {"model": LLM_MODEL, "warm": False, "seconds": None, "error": None},
+        }
+
+    @property
+    def ready(self) -> bool:
+        return self.started and (
+            not MODEL_WARMUP or all(m["warm"] for m in self.models.values())
+        )
+
+    def report(self):
+        return {
+            "ready": self.ready,
+            "started": self.started,
+            "warmup": MODEL_WARMUP,
+            "models": self.models,
+        }
+
+
+warm_state = WarmState()
+
+
+async def _warm_embed():
+    response = await ollama_async_http.post(
+        "/api/embed",
+        json={
+            "model": EMBED_MODEL,
+            "keep_alive": OLLAMA_KEEP_ALIVE,
+            "input": ["warm-up"],
+        },
+    )
+    response.raise_for_status()
+
+
+async def _warm_llm():
+    # Evaluating the shared prompt prefix also leaves it in Ollama's
+    # KV cache for the first real question.
+    response = await ollama_async_http.post(
+        "/api/generate",
+        json={
+            "model": LLM_MODEL,
+            "keep_alive": OLLAMA_KEEP_ALIVE,
+            "prompt": PROMPT_PREFIX,
+            "stream": False,
+            "options": {"num_predict": 1},
+        },
+    )
+    response.raise_for_status()
+
+
+async def warm_models():
+    """
+    Load both models into Ollama, retrying until each one answers.
+    Started as a background task from the API lifespan.
+    """
+
+    steps = {"embed": _warm_embed, "llm": _warm_llm}
+
+    while True:
+        for name, step in steps.items():
+            state = warm_state.models[name]
+
+            if state["warm"]:
+                continue
+
+            started = time.monotonic()
+
+            try:
+                await step()
+            except Exception as e:
+                state["error"] = str(e)
+                print(f"Warm-up of {state['model']} failed: {e}")
+                continue
+
+            state.update(
+                warm=True,
+                seconds=round(time.monotonic() - started, 3),
+                error=None,
+            )
+            print(f"Warmed {state['model']} in {state['seconds']}s")
+
+        if all(m["warm"] for m in warm_state.models.values()):
+            return
+
+        await asyncio.sleep(WARMUP_RETRY_SECONDS)
@@ -0,0 +1,144 @@
+"""
+Stand-in for the Ollama HTTP API used by the benchmarks: /api/embed,
+/api/generate (streaming or not) and /api/tags, with configurable latency.
+Embeddings are deterministic per input text.
+
+    python -m bench.fake_ollama --port 11435 --latency-ms 20
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+FAKE_OLLAMA_LATENCY_MS = float(os.getenv("FAKE_OLLAMA_LATENCY_MS", "0"))
+FAKE_OLLAMA_TOKEN_LATENCY_MS = float(os.getenv("FAKE_OLLAMA_TOKEN_LATENCY_MS", "0"))
+FAKE_OLLAMA_TOKENS = int(os.getenv("FAKE_OLLAMA_TOKENS", "64"))
+FAKE_OLLAMA_DIM = int(os.getenv("FAKE_OLLAMA_DIM", "768"))
+
+
+def fake_embedding(text: str, dim: int = FAKE_OLLAMA_DIM):
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    # Keep-alive, like the real server; the clients pool connections.
+    protocol_version = "HTTP/1.1"
+
+    latency_ms = FAKE_OLLAMA_LATENCY_MS
+    token_latency_ms = FAKE_OLLAMA_TOKEN_LATENCY_MS
+    tokens = FAKE_OLLAMA_TOKENS
+    dim = FAKE_OLLAMA_DIM
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": []})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        payload = self._read_json()
+        time.sleep(self.latency_ms / 1000)
+
+        if self.path == "/api/embed":
+            texts = payload.get("input", [])
+            if isinstance(texts, str):
+                texts = [texts]
+
+            self._send_json({
+                "model": payload.get("model"),
+                "embeddings": [fake_embedding(t, self.dim) for t in texts],
+            })
+
+        elif self.path == "/api/generate":
+            words = [f"token{i} " for i in range(self.tokens)]
+
+            if payload.get("stream", True):
+                self._stream(payload, words)
+            else:
+                time.sleep(self.token_latency_ms * self.tokens / 1000)
+                self._send_json({
+                    "model": payload.get("model"),
+                    "response": "".join(words),
+                    "done": True,
+                })
+
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def _stream(self, payload, words):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def chunk(obj):
+            data = (json.dumps(obj) + "\n").encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        for word in words:
+            time.sleep(self.token_latency_ms / 1000)
+            chunk({"model": payload.get("model"), "response": word, "done": False})
+
+        chunk({"model": payload.get("model"), "response": "", "done": True})
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class FakeOllama:
+    """
+    Runs the fake server on a background thread; url is set once started.
+    """
+
+    def __init__(self, port: int = 0, latency_ms: float = FAKE_OLLAMA_LATENCY_MS):
+        handler = type(
+            "Handler",
+            (FakeOllamaHandler,),
+            {"latency_ms": latency_ms},
+        )
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency-ms", type=float, default=FAKE_OLLAMA_LATENCY_MS)
+    args = parser.parse_args()
+
+    fake = FakeOllama(args.port, args.latency_ms)
+    print(f"Fake Ollama listening on {fake.url}")
+    fake.server.serve_forever()
@@ -0,0 +1,262 @@
+"""
+Microbenchmarks for the RAG and competency hot paths.
+
+Runs against the Postgres named by BENCH_DB_NAME (the other DB_* settings
+come from the environment / .env as usual) and an in-process fake Ollama.
+The database is reseeded with a synthetic catalog on every run, so it must
+be a scratch database.
+
+    BENCH_DB_NAME=competency_bench python -m bench.run --size 2000 --save main
+    BENCH_DB_NAME=competency_bench python -m bench.run --compare main
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from bench.fake_ollama import FakeOllama
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+
+
+def summarize(name, samples, ops_per_sample=1):
+    seconds = np.asarray(samples)
+    ms = seconds * 1000
+
+    return {
+        "name": name,
+        "iterations": len(samples),
+        "ops_per_s": len(samples) * ops_per_sample / seconds.sum(),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+    }
+
+
+def warmup_count(iterations):
+    return min(10, max(1, iterations // 10))
+
+
+def measure(name, fn, iterations, ops_per_sample=1):
+    for i in range(warmup_count(iterations)):
+        fn(-1 - i)
+
+    samples = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - started)
+
+    return summarize(name, samples, ops_per_sample)
+
+
+async def measure_async(name, fn, iterations, ops_per_sample=1):
+    for i in range(warmup_count(iterations)):
+        await fn(-1 - i)
+
+    samples = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        await fn(i)
+        samples.append(time.perf_counter() - started)
+
+    return summarize(name, samples, ops_per_sample)
+
+
+def sync_benchmarks(args, size):
+    from app.ingest import ingest
+    from app.embedding import get_embedding
+    from app.advisor_eval import evaluate_answer
+
+    results = []
+
+    def run_ingest(i):
+        ingest(full=True)
+
+    # A full re-embed of the catalog per sample; ops/s is rows/s.
+    results.append(measure("ingest", run_ingest, args.ingest_runs, size))
+
+    results.append(measure(
+        "get_embedding_uncached",
+        lambda i: get_embedding(f"benchmark question {i} {time.time_ns()}"),
+        args.iterations,
+    ))
+    results.append(measure(
+        "get_embedding_cached",
+        lambda i: get_embedding("benchmark question"),
+        args.iterations,
+    ))
+
+    answer = (
+        "To reach Python Fundamentals E3, complete E1 and E2 first. "
+        "The Python Fundamentals roadmap covers testing and packaging. "
+    ) * 8
+    results.append(measure(
+        "evaluate_answer",
+        lambda i: evaluate_answer(answer, "Python Fundamentals", "E3"),
+        args.iterations * 10,
+    ))
+
+    return results
+
+
+async def async_benchmarks(args, employee_id):
+    from app.db import AsyncSessionLocal, async_engine
+    from app.catalog import catalog_store
+    from app.competency_service import get_next_competency
+    from app.main import build_learning_sequence
+    from app.rag import retrieve_context, retrieve_hybrid, build_prompt
+
+    from bench.seed import TOPICS, QUALIFIERS
+
+    questions = [
+        f"What does {t} {q} cover at an advanced level?"
+        for t in TOPICS for q in QUALIFIERS
+    ]
+    results = []
+
+    await catalog_store.refresh(force=True)
+
+    # Questions repeat, so after warm-up this measures retrieval with the
+    # embedding cache hot.
+    results.append(await measure_async(
+        "retrieve_context",
+        lambda i: retrieve_context(questions[i % len(questions)]),
+        args.iterations,
+    ))
+
+    async with AsyncSessionLocal() as session:
+        results.append(await measure_async(
+            "retrieve_hybrid",
+            lambda i: retrieve_hybrid(session, questions[i % len(questions)]),
+            args.iterations,
+        ))
+        results.append(await measure_async(
+            "get_next_competency",
+            lambda i: get_next_competency(session, employee_id),
+            args.iterations,
+        ))
+
+    rows = await retrieve_context(questions[0])
+    results.append(measure(
+        "build_prompt",
+        lambda i: build_prompt(questions[i % len(questions)], rows),
+        args.iterations * 10,
+    ))
+
+    roadmap_question = "How do I complete Python Fundamentals (Level: E3)"
+    results.append(await measure_async(
+        "build_learning_sequence",
+        lambda i: build_learning_sequence(roadmap_question),
+        args.iterations * 10,
+    ))
+
+    await async_engine.dispose()
+
+    return results
+
+
+def print_results(results, baseline=None, threshold=0.2):
+    baseline = {r["name"]: r for r in (baseline or [])}
+    regressions = []
+
+    print(
+        f"{'benchmark':<26}{'ops/s':>12}{'p50 ms':>10}"
+        f"{'p95 ms':>10}{'p99 ms':>10}{'vs base':>10}"
+    )
+
+    for r in results:
+        line = (
+            f"{r['name']:<26}{r['ops_per_s']:>12.1f}{r['p50_ms']:>10.3f}"
+            f"{r['p95_ms']:>10.3f}{r['p99_ms']:>10.3f}"
+        )
+
+        base = baseline.get(r["name"])
+        if base:
+            change = r["p50_ms"] / base["p50_ms"] - 1
+            line += f"{change:>+10.0%}"
+
+            if change > threshold:
+                line += "  REGRESSION"
+                regressions.append(r["name"])
+
+        print(line)
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=int(os.getenv("BENCH_CATALOG_SIZE", "1000")))
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--ingest-runs", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=0.0,
+                        help="delay the fake Ollama adds to every request")
+    parser.add_argument("--save", metavar="NAME", help="save results as a baseline")
+    parser.add_argument("--compare", metavar="NAME", help="compare with a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="p50 slowdown reported as a regression (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    db_name = os.getenv("BENCH_DB_NAME")
+    if not db_name:
+        sys.exit("Set BENCH_DB_NAME to a scratch database; it is reseeded.")
+
+    fake = FakeOllama(latency_ms=args.latency_ms).start()
+
+    # app.* reads its settings at import time, so set them first.
+    os.environ["DB_NAME"] = db_name
+    os.environ["OLLAMA_BASE_URL"] = fake.url
+    os.environ["EMBED_CACHE_PATH"] = ""
+
+    from app.db import SessionLocal
+    from app.schema import migrate
+    from bench.seed import seed
+
+    session = SessionLocal()
+    try:
+        employee_id = seed(session, args.size)
+        migrate(session)
+    finally:
+        session.close()
+
+    print(f"Seeded {args.size} competencies; fake Ollama at {fake.url}")
+
+    try:
+        results = sync_benchmarks(args, args.size)
+        results += asyncio.run(async_benchmarks(args, employee_id))
+    finally:
+        fake.stop()
+
+    baseline = None
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json")) as f:
+            baseline = json.load(f)["results"]
+
+    regressions = print_results(results, baseline, args.threshold)
+
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f"{args.save}.json")
+
+        with open(path, "w") as f:
+            json.dump({
+                "size": args.size,
+                "iterations": args.iterations,
+                "latency_ms": args.latency_ms,
+                "results": results,
+            }, f, indent=2)
+
+        print(f"Saved baseline {path}")
+
+    if regressions:
+        sys.exit(f"Regressions: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
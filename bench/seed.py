@@ -0,0 +1,177 @@
+"""
+Synthetic competency catalog for the benchmarks. Creates the base tables
+if they are missing, then replaces their contents. Only ever point this at
+a scratch database.
+"""
+
+import random
+
+from sqlalchemy import text
+
+BENCH_EMAIL = "bench@example.com"
+BENCH_PASSWORD = "bench-password"
+
+SCHEMA = [
+    "CREATE EXTENSION IF NOT EXISTS vector",
+    """
+    CREATE TABLE IF NOT EXISTS public.competency_catalog (
+        competency_id SERIAL PRIMARY KEY,
+        competency_name TEXT NOT NULL,
+        description TEXT,
+        category TEXT,
+        focus_area TEXT,
+        sub_focus_area TEXT,
+        microskills TEXT,
+        proficiency_level_name TEXT,
+        pre_requisite_id INT,
+        embedding vector
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS public.employees (
+        employee_id SERIAL PRIMARY KEY,
+        email TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS public.employee_sessions (
+        token TEXT PRIMARY KEY,
+        employee_id INT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS public.employee_competency (
+        employee_id INT NOT NULL,
+        competency_id INT NOT NULL,
+        status TEXT,
+        progress INT DEFAULT 0,
+        started_on TIMESTAMPTZ,
+        PRIMARY KEY (employee_id, competency_id)
+    )
+    """,
+]
+
+TOPICS = [
+    "Python", "SQL", "Azure", "Kubernetes", "Docker", "Terraform", "Spark",
+    "Kafka", "React", "Java", "Go", "Rust", "Airflow", "Snowflake", "Linux",
+    "Networking", "Security", "Testing", "Observability", "Machine Learning",
+]
+QUALIFIERS = [
+    "Fundamentals", "Data Engineering", "Administration", "Architecture",
+    "Performance", "Automation", "Development", "Operations",
+]
+CATEGORIES = ["Technical", "Cloud", "Data", "Platform"]
+FOCUS_AREAS = ["Engineering", "Analytics", "Infrastructure", "Delivery"]
+
+
+def create_schema(session):
+    for statement in SCHEMA:
+        session.execute(text(statement))
+
+    session.commit()
+
+
+def catalog_rows(size: int, levels: int, rng: random.Random):
+    """
+    `size` rows as competencies of `levels` levels each; every level
+    after E1 requires the previous one.
+    """
+
+    names = [f"{t} {q}" for q in QUALIFIERS for t in TOPICS]
+    rows = []
+    competency_id = 0
+
+    for n in range(-(-size // levels)):
+        name = names[n % len(names)]
+        if n >= len(names):
+            name = f"{name} {n // len(names) + 1}"
+
+        category = rng.choice(CATEGORIES)
+        focus_area = rng.choice(FOCUS_AREAS)
+        previous = None
+
+        for level in range(1, levels + 1):
+            if competency_id == size:
+                return rows
+
+            competency_id += 1
+            rows.append({
+                "id": competency_id,
+                "name": name,
+                "description": (
+                    f"Applies {name.lower()} at level {level}: "
+                    + " ".join(rng.sample(TOPICS, 4)).lower()
+                ),
+                "category": category,
+                "focus_area": focus_area,
+                "sub_focus_area": rng.choice(QUALIFIERS),
+                "microskills": ", ".join(rng.sample(TOPICS, 3)),
+                "level": f"E{level}",
+                "prereq": previous,
+            })
+            previous = competency_id
+
+    return rows
+
+
+def seed(session, size: int, levels: int = 5, seed: int = 0):
+    """
+    Returns the employee_id of a benchmark user who has completed the
+    first level of roughly half the competencies.
+    """
+
+    from app.passwords import hash_password
+
+    rng = random.Random(seed)
+    create_schema(session)
+
+    session.execute(text("""
+        TRUNCATE public.competency_catalog,
+                 public.employees,
+                 public.employee_sessions,
+                 public.employee_competency
+        RESTART IDENTITY
+    """))
+
+    rows = catalog_rows(size, levels, rng)
+
+    session.execute(text("""
+        INSERT INTO public.competency_catalog(
+            competency_id, competency_name, description, category,
+            focus_area, sub_focus_area, microskills,
+            proficiency_level_name, pre_requisite_id
+        )
+        VALUES (
+            :id, :name, :description, :category,
+            :focus_area, :sub_focus_area, :microskills,
+            :level, :prereq
+        )
+    """), rows)
+
+    employee_id = session.execute(text("""
+        INSERT INTO public.employees(email, password)
+        VALUES (:email, :password)
+        RETURNING employee_id
+    """), {
+        "email": BENCH_EMAIL,
+        "password": hash_password(BENCH_PASSWORD),
+    }).scalar()
+
+    completed = [
+        {"eid": employee_id, "cid": r["id"]}
+        for r in rows
+        if r["prereq"] is None and rng.random() < 0.5
+    ]
+
+    if completed:
+        session.execute(text("""
+            INSERT INTO public.employee_competency(
+                employee_id, competency_id, status, started_on
+            )
+            VALUES (:eid, :cid, 'COMPLETED', now())
+        """), completed)
+
+    session.commit()
+
+    return employee_id
@@ -4,6 +4,7 @@ import os
 ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.append(ROOT_DIR)
 
+import json
 import streamlit as st
 import requests
 import sys, os
@@ -57,6 +58,32 @@ def login_screen():
         st.session_state.token = data["token"]
         st.rerun()
 
+def stream_events(url, params, headers):
+    """
+    Yield (event, data) pairs from a Server-Sent Events endpoint as they
+    arrive.
+    """
+
+    with requests.get(
+        url,
+        params=params,
+        headers=headers,
+        stream=True,
+        # Connect timeout, then max wait between streamed tokens.
+        timeout=(10, 600),
+    ) as resp:
+        resp.raise_for_status()
+
+        event = "message"
+        for line in resp.iter_lines(decode_unicode=True):
+            if not line:
+                event = "message"
+            elif line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                yield event, json.loads(line[len("data:"):])
+
+
 def advisor_chat(headers):
     st.subheader("AI Competency Advisor")
 
@@ -67,18 +94,17 @@ def advisor_chat(headers):
 
     if st.button("Ask Advisor"):
         try:
-            resp = requests.get(
-                f"{API}/advisor",
+            placeholder = st.empty()
+            answer = ""
+
+            for event, data in stream_events(
+                f"{API}/advisor/stream",
                 params={"question": question},
                 headers=headers,
-                timeout=600,
-            )
-
-            resp.raise_for_status()
-            data = resp.json()
-
-            answer = data["answer"]
-            st.write(answer)
+            ):
+                if event == "token":
+                    answer += data["text"]
+                    placeholder.markdown(answer)
 
             accuracy = compute_answer_accuracy(question, answer)
 
@@ -163,6 +189,12 @@ def dashboard():
     # ---------- Logout ----------
     st.divider()
     if st.button("Logout"):
+        try:
+            requests.post(f"{API}/logout", headers=headers, timeout=5)
+        except Exception:
+            # The session still expires server-side on its own.
+            pass
+
         st.session_state.token = None
         st.rerun()
 
@@ -0,0 +1,50 @@
+import json
+
+from app.advisor_eval import (
+    evaluate_answer,
+    extract_competency_and_level,
+    score_lines,
+    score_log,
+)
+
+QUESTION = "How to complete Azure (Level: E2)"
+
+
+def line(question, answer):
+    return json.dumps({"question": question, "answer": answer})
+
+
+def test_extract_and_evaluate():
+    assert extract_competency_and_level(QUESTION) == ("Azure", "E2")
+    assert evaluate_answer("Azure: E1 then E2", "Azure", "E2") == 1
+    assert evaluate_answer("No idea", "Azure", "E2") == 0
+
+
+def test_score_lines_aggregates_and_skips_malformed():
+    totals, skipped = score_lines([
+        line(QUESTION, "Azure: E1 then E2"),
+        line("how to complete azure (level: e2)", "No idea"),
+        line(None, "Azure E2"),
+        line(5, "Azure E2"),
+        line(QUESTION, None),
+        line("What is Azure?", "Azure E2"),
+        "not json",
+        "[1, 2]",
+        json.dumps({"question": QUESTION}),
+    ])
+
+    assert totals == {("azure", "E2"): [2, 1.0, 1]}
+    assert skipped == 7
+
+
+def test_score_log_survives_blank_chunks(tmp_path):
+    log = tmp_path / "answers.jsonl"
+    log.write_text(
+        line(QUESTION, "Azure E2") + "\n\n\n\n"
+        + line(QUESTION, "Azure E2") + "\n"
+    )
+
+    report = score_log(str(log), workers=1, chunk_lines=2)
+
+    assert report["answers"] == 2
+    assert report["skipped"] == 0
@@ -0,0 +1,51 @@
+import asyncio
+
+import numpy as np
+
+from app.embedding_cache import EmbeddingCache
+
+
+def test_memory_and_disk_tiers(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    cache = EmbeddingCache(max_entries=10, path=path)
+    cache.put("m", "Hello  World", np.array([1, 2], dtype=np.float32))
+
+    assert cache.get("m", "hello world").tolist() == [1, 2]
+
+    # A second worker sharing the file finds it on disk.
+    other = EmbeddingCache(max_entries=10, path=path)
+    assert other.get("m", "HELLO world").tolist() == [1, 2]
+    assert other.get("m", "unknown") is None
+    assert other.stats()["disk_hits"] == 1
+    assert other.stats()["misses"] == 1
+
+
+def test_async_paths(tmp_path):
+    cache = EmbeddingCache(max_entries=10, path=str(tmp_path / "e.sqlite3"))
+
+    async def main():
+        await cache.put_many_async("m", [("a", [1.0]), ("b", [2.0])])
+        fresh = EmbeddingCache(max_entries=10, path=cache.path)
+        found = await fresh.get_many_async("m", ["a", "b", "c", "a"])
+        one = await fresh.get_async("m", " B ")
+        return found, one
+
+    found, one = asyncio.run(main())
+
+    assert found["a"].tolist() == [1.0]
+    assert found["b"].tolist() == [2.0]
+    assert found["c"] is None
+    assert one.tolist() == [2.0]
+
+
+def test_disk_errors_are_best_effort(tmp_path):
+    cache = EmbeddingCache(max_entries=10, path=str(tmp_path / "e.sqlite3"))
+    # Any sqlite3.Error (e.g. "database is locked") must not fail a request.
+    cache._db.close()
+
+    cache.put("m", "a", [1.0])
+    asyncio.run(cache.put_many_async("m", [("b", [2.0])]))
+
+    assert cache.get("m", "a").tolist() == [1.0]
+    assert cache.get("m", "b").tolist() == [2.0]
+    assert cache.get("m", "c") is None
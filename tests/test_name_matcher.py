@@ -0,0 +1,55 @@
+from app.catalog import CatalogSnapshot, CompetencyRecord
+from app.name_matcher import NameMatcher
+
+
+def test_longest_name_wins():
+    matcher = NameMatcher(["Python", "Python Fundamentals", "SQL"])
+
+    assert matcher.find("How do I finish python fundamentals E2?") == "Python Fundamentals"
+    assert matcher.find("Python or SQL?") == "Python"
+
+
+def test_earliest_match_on_equal_length():
+    matcher = NameMatcher(["Java", "Rust"])
+
+    assert matcher.find("rust then java") == "Rust"
+
+
+def test_case_and_whitespace_insensitive():
+    matcher = NameMatcher(["Cloud  Security "])
+
+    assert matcher.find("what is CLOUD security about") == "Cloud  Security "
+
+
+def test_matches_brute_force():
+    names = ["ab", "abc", "bc", "c", "bcd", "xyz", "cdx"]
+    matcher = NameMatcher(names)
+
+    for text in ["abcdxyz", "zzbcd", "xabcx", "cdxyz", "nothing"]:
+        found = [n for n in names if n in text]
+        expected = min(
+            found, key=lambda n: (-len(n), text.index(n)), default=None
+        )
+        assert matcher.find(text, fuzzy=False) == expected
+
+
+def test_fuzzy_fallback():
+    matcher = NameMatcher(["Kubernetes", "Terraform"])
+
+    assert matcher.find("help with kubernetis") == "Kubernetes"
+    assert matcher.find("help with kubernetis", fuzzy=False) is None
+    assert matcher.find("something unrelated") is None
+
+
+def test_snapshot_lookups_use_matcher_keys():
+    snapshot = CatalogSnapshot([
+        CompetencyRecord(1, "Azure ", "E2", None),
+        CompetencyRecord(2, "Azure ", "E1", None),
+        CompetencyRecord(3, "Python", "E1", None),
+    ])
+
+    name = snapshot.find_in("How to complete azure (Level: E2)")
+
+    assert [r.competency_id for r in snapshot.records(name)] == [2, 1]
+    assert snapshot.levels(name) == ("E1", "E2")
+    assert snapshot.levels(" AZURE") == ("E1", "E2")
@@ -0,0 +1,44 @@
+from app.prerequisites import PrerequisiteGraph, is_completed
+
+
+def test_topological_order_with_id_ties():
+    graph = PrerequisiteGraph({1: None, 2: 1, 3: 1, 4: 2, 5: None})
+
+    assert graph.order == [1, 2, 3, 4, 5]
+    assert graph.cyclic == []
+
+
+def test_every_prerequisite_comes_first():
+    prerequisites = {i: i // 3 or None for i in range(20, 0, -1)}
+    graph = PrerequisiteGraph(prerequisites)
+    position = {cid: i for i, cid in enumerate(graph.order)}
+
+    assert graph.cyclic == []
+
+    for cid, pid in prerequisites.items():
+        if pid is not None:
+            assert position[pid] < position[cid]
+
+
+def test_cycles_are_listed_and_ordered_last():
+    graph = PrerequisiteGraph({1: None, 2: 3, 3: 2, 4: 3, 5: 1})
+
+    assert graph.cyclic == [2, 3, 4]
+    assert graph.order == [1, 5, 2, 3, 4]
+
+
+def test_unlocked():
+    graph = PrerequisiteGraph({1: None, 2: 1, 3: 2, 4: None})
+
+    assert graph.unlocked(set()) == [1, 4]
+    assert graph.unlocked({1}) == [2, 4]
+    assert graph.unlocked({1, 2, 4}) == [3]
+    assert graph.can_start(3, {2})
+    assert not graph.can_start(3, {1})
+
+
+def test_is_completed():
+    assert is_completed("completed")
+    assert is_completed("COMPLETED")
+    assert not is_completed("IN_PROGRESS")
+    assert not is_completed(None)
@@ -0,0 +1,54 @@
+from collections import namedtuple
+
+from app.prompt import build_context, context_blocks, estimate_tokens
+
+Row = namedtuple(
+    "Row",
+    [
+        "competency_name",
+        "description",
+        "category",
+        "focus_area",
+        "proficiency_level_name",
+    ],
+)
+
+
+def test_levels_of_one_competency_are_merged():
+    blocks = context_blocks([
+        Row("Python", "Core  language", "Tech", "Dev", "E3"),
+        Row("SQL", "Queries", "Tech", "Data", "E1"),
+        Row("python", "Core language", "Tech", "Dev", "E1"),
+        Row("Python", "Packaging", "Tech", "Dev", "E2"),
+    ])
+
+    assert len(blocks) == 2
+    assert blocks[0] == (
+        "Competency: Python\n"
+        "Description: Core language Packaging\n"
+        "Category: Tech\n"
+        "Focus Area: Dev\n"
+        "Proficiency: E1, E2, E3"
+    )
+    assert blocks[1].startswith("Competency: SQL\n")
+
+
+def test_context_stays_within_budget_in_retrieval_order():
+    rows = [Row(f"Skill {i}", "x" * 200, "C", "F", "E1") for i in range(10)]
+    context = build_context(rows, budget=200)
+
+    assert estimate_tokens(context) <= 200
+    assert context.startswith("Competency: Skill 0\n")
+    assert "Skill 1\n" in context
+    assert "Skill 9" not in context
+
+
+def test_best_match_is_kept_and_cut_to_fit():
+    context = build_context([Row("Huge", "y" * 10_000, "C", "F", "E1")], budget=50)
+
+    assert context.startswith("Competency: Huge\n")
+    assert len(context) == 200
+
+
+def test_empty_context():
+    assert build_context([]) == ""
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from app.single_flight import SingleFlight
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def main():
+        return await asyncio.gather(*[flight.do("k", work) for _ in range(10)])
+
+    results = run(main())
+
+    assert len(calls) == 1
+    assert [r for r, _ in results] == ["answer"] * 10
+    assert sum(shared for _, shared in results) == 9
+    assert flight.stats() == {"in_flight": 0, "started": 1, "joined": 9}
+
+
+def test_distinct_keys_and_later_calls_run_again():
+    flight = SingleFlight()
+    calls = []
+
+    async def work(key):
+        calls.append(key)
+        await asyncio.sleep(0)
+        return key
+
+    async def main():
+        await asyncio.gather(
+            flight.do("a", lambda: work("a")),
+            flight.do("b", lambda: work("b")),
+        )
+        await flight.do("a", lambda: work("a"))
+
+    run(main())
+
+    # Nothing is cached once a call finishes.
+    assert sorted(calls) == ["a", "a", "b"]
+
+
+def test_error_reaches_every_caller():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        return await asyncio.gather(
+            *[flight.do("k", fail) for _ in range(3)], return_exceptions=True
+        )
+
+    results = run(main())
+
+    assert all(isinstance(r, ValueError) for r in results)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+        return await follower
+
+    assert run(main()) == ("done", True)
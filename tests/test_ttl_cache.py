@@ -0,0 +1,52 @@
+from app.ttl_cache import TTLCache
+
+
+def test_get_put_and_stats():
+    cache = TTLCache(max_entries=2, ttl_seconds=60)
+
+    assert cache.get("a") is None
+    cache.put("a", 1)
+
+    assert cache.get("a") == 1
+    assert cache.stats() == {
+        "entries": 1, "max_entries": 2, "hits": 1, "misses": 1,
+    }
+
+
+def test_evicts_least_recently_used():
+    cache = TTLCache(max_entries=2, ttl_seconds=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.ttl_cache.time.monotonic", lambda: now[0])
+
+    cache = TTLCache(max_entries=10, ttl_seconds=5)
+    cache.put("a", 1)
+    cache.put("b", 2, ttl_seconds=60)
+
+    now[0] += 10
+
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.stats()["entries"] == 1
+
+
+def test_pop_and_clear():
+    cache = TTLCache(max_entries=10, ttl_seconds=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+
+    assert cache.pop("a") == 1
+    assert cache.pop("a") is None
+
+    cache.clear()
+    assert cache.get("b") is None
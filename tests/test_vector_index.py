@@ -0,0 +1,159 @@
+from collections import namedtuple
+
+import numpy as np
+import pytest
+
+from app.vector_index import VectorIndex
+
+Row = namedtuple(
+    "Row",
+    [
+        "competency_id",
+        "competency_name",
+        "description",
+        "category",
+        "focus_area",
+        "proficiency_level_name",
+        "embedding",
+    ],
+)
+Marks = namedtuple("Marks", ["xmin", "first", "last"])
+
+
+def row(competency_id, embedding):
+    return Row(
+        competency_id, f"c{competency_id}", "", "", "", "E1",
+        np.asarray(embedding, dtype=np.float32),
+    )
+
+
+def brute_force(rows, query, k):
+    """
+    Cosine ranking with the competency_id tie-break the SQL path uses.
+    """
+
+    query = np.asarray(query, dtype=np.float64)
+
+    def cosine(r):
+        v = np.asarray(r.embedding, dtype=np.float64)
+        norm = np.linalg.norm(v) * np.linalg.norm(query)
+        return float(v @ query / norm) if norm else 0.0
+
+    scored = sorted(rows, key=lambda r: (-round(cosine(r), 6), r.competency_id))
+    return [r.competency_id for r in scored[:k]]
+
+
+class Result:
+    def __init__(self, value):
+        self.value = value
+
+    def fetchone(self):
+        return self.value
+
+    def fetchall(self):
+        return self.value
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.value
+
+
+class FakeCatalog:
+    """
+    Just enough of competency_catalog and its change log for
+    VectorIndex.load/refresh: rows by id and (seq, xid, competency_id)
+    change entries.
+    """
+
+    def __init__(self, rows):
+        self.rows = {r.competency_id: r for r in rows}
+        self.changes = []
+        self.xmin = 1
+
+    def write(self, seq, xid, r):
+        self.rows[r.competency_id] = r
+        self.changes.append((seq, xid, r.competency_id))
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+
+        if "pg_snapshot_xmin" in sql:
+            seqs = [seq for seq, _, _ in self.changes]
+            return Result(Marks(
+                self.xmin,
+                min(seqs) if seqs else None,
+                max(seqs) if seqs else None,
+            ))
+
+        if "competency_catalog_changes" in sql:
+            since = int(params["xmin"])
+            return Result(sorted({
+                cid for _, xid, cid in self.changes if xid >= since
+            }))
+
+        if "ANY(:ids)" in sql:
+            return Result([
+                self.rows[i] for i in params["ids"] if i in self.rows
+            ])
+
+        return Result([self.rows[i] for i in sorted(self.rows)])
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(7)
+
+
+def test_search_matches_brute_force(rng):
+    rows = [row(i, rng.normal(size=8)) for i in range(1, 201)]
+    ids, matrix, index_rows = VectorIndex._build(rows)
+
+    index = VectorIndex()
+    index._state = (ids, matrix, index_rows)
+
+    for _ in range(50):
+        query = rng.normal(size=8)
+        for k in (1, 5, 10):
+            found = [r.competency_id for r in index.search(query, k)]
+            assert found == brute_force(rows, query, k)
+
+
+def test_ties_broken_by_competency_id():
+    # Same direction, different lengths: identical cosine similarity.
+    rows = [row(i, [1.0 * i, 0.0]) for i in (5, 3, 9, 1)] + [row(2, [0.0, 1.0])]
+    index = VectorIndex()
+    index._state = VectorIndex._build(rows)
+
+    assert [r.competency_id for r in index.search([1.0, 0.0], 3)] == [1, 3, 5]
+    assert brute_force(rows, [1.0, 0.0], 3) == [1, 3, 5]
+
+
+def test_refresh_merge_matches_brute_force(rng):
+    db = FakeCatalog([row(i, rng.normal(size=8)) for i in range(1, 51)])
+    index = VectorIndex()
+    index.load(db)
+
+    # Transaction 10 wrote seq 1 but commits after transaction 11 (seq 2)
+    # was already seen: it must still be picked up.
+    db.write(2, 11, row(7, rng.normal(size=8)))
+    db.xmin = 10
+    index.refresh(db)
+
+    db.write(1, 10, row(3, rng.normal(size=8)))
+    db.write(3, 12, row(51, rng.normal(size=8)))
+    del db.rows[20]
+    db.changes.append((4, 12, 20))
+    db.xmin = 13
+    index.refresh(db)
+
+    assert sorted(index._state[0].tolist()) == sorted(db.rows)
+
+    rows = list(db.rows.values())
+    for _ in range(20):
+        query = rng.normal(size=8)
+        assert (
+            [r.competency_id for r in index.search(query, 10)]
+            == brute_force(rows, query, 10)
+        )